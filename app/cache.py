@@ -0,0 +1,29 @@
+import time
+
+
+class TTLCache:
+    """Einfacher In-Process-Cache mit fester Lebensdauer pro Eintrag."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._data = {}
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return default
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def pop(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+# Dashboard-Kontext; Daten ändern sich nur mit dem Sync-Takt (min. 30s),
+# wird nach jedem Sync und beim Speichern der Einstellungen geleert
+dashboard_cache = TTLCache(ttl=30)
@@ -1,71 +1,104 @@
 import httpx
 import logging
+import orjson
+from contextlib import asynccontextmanager
 from . import settings as S
 
 logger = logging.getLogger(__name__)
 
 
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Knappe Timeouts für den interaktiven Verbindungstest
+TEST_TIMEOUT = httpx.Timeout(connect=2.0, read=3.0, write=2.0, pool=1.0)
+
+
+def _json_body(payload):
+    """Request-Body per orjson serialisieren (statt httpx' stdlib-json)."""
+    return {"content": orjson.dumps(payload), "headers": _JSON_HEADERS}
+
+
+def _http_options():
+    """Gemeinsame Pool-/Timeout-Einstellungen für die persistenten AsyncClients."""
+    return {
+        # HTTP/2 multiplext parallele Requests über eine Verbindung;
+        # fällt automatisch auf HTTP/1.1 zurück, wenn der Server kein h2 spricht
+        "http2": True,
+        "timeout": httpx.Timeout(30.0, pool=10.0),
+        "limits": httpx.Limits(
+            max_connections=int(S.get("HTTP_MAX_CONN", "200")),
+            max_keepalive_connections=int(S.get("HTTP_KEEPALIVE", "50")),
+            keepalive_expiry=60.0,
+        ),
+    }
+
+
 class SpoolmanClient:
     """Client für Spoolman API."""
 
     def __init__(self):
         self.base = S.get("SPOOLMAN_BASE").rstrip('/')
+        # Ein langlebiger Client pro Instanz: Keep-Alive-Pool statt neuem
+        # TCP/TLS-Handshake bei jedem Request
+        self._client = httpx.AsyncClient(base_url=self.base, **_http_options())
+
+    async def aclose(self):
+        """Schließt den HTTP-Client und alle offenen Verbindungen."""
+        await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
 
     async def list_spools(self):
         """Listet alle Spulen auf (inkl. archivierte)."""
-        async with httpx.AsyncClient(timeout=30) as c:
-            r = await c.get(f"{self.base}/spool?allow_archived=true")
-            r.raise_for_status()
-            return r.json()
+        r = await self._client.get("/spool?allow_archived=true")
+        r.raise_for_status()
+        return orjson.loads(r.content)
 
     async def list_filaments(self):
         """Listet alle Filamente auf."""
-        async with httpx.AsyncClient(timeout=30) as c:
-            r = await c.get(f"{self.base}/filament")
-            r.raise_for_status()
-            return r.json()
+        r = await self._client.get("/filament")
+        r.raise_for_status()
+        return orjson.loads(r.content)
 
     async def list_vendors(self):
         """Listet alle Hersteller/Vendors auf."""
-        async with httpx.AsyncClient(timeout=30) as c:
-            r = await c.get(f"{self.base}/vendor")
-            r.raise_for_status()
-            return r.json()
+        r = await self._client.get("/vendor")
+        r.raise_for_status()
+        return orjson.loads(r.content)
 
     async def create_vendor(self, payload):
         """Erstellt einen neuen Hersteller/Vendor."""
-        async with httpx.AsyncClient(timeout=30) as c:
-            r = await c.post(f"{self.base}/vendor", json=payload)
-            r.raise_for_status()
-            return r.json()
+        r = await self._client.post("/vendor", **_json_body(payload))
+        r.raise_for_status()
+        return orjson.loads(r.content)
 
     async def create_filament(self, payload):
         """Erstellt ein neues Filament."""
-        async with httpx.AsyncClient(timeout=30) as c:
-            r = await c.post(f"{self.base}/filament", json=payload)
-            r.raise_for_status()
-            return r.json()
+        r = await self._client.post("/filament", **_json_body(payload))
+        r.raise_for_status()
+        return orjson.loads(r.content)
     
     async def create_spool(self, payload):
         """Erstellt eine neue Spule."""
-        async with httpx.AsyncClient(timeout=30) as c:
-            r = await c.post(f"{self.base}/spool", json=payload)
-            r.raise_for_status()
-            return r.json()
+        r = await self._client.post("/spool", **_json_body(payload))
+        r.raise_for_status()
+        return orjson.loads(r.content)
     
     async def update_spool(self, spool_id, payload):
         """Aktualisiert eine Spule."""
-        async with httpx.AsyncClient(timeout=30) as c:
-            r = await c.patch(f"{self.base}/spool/{spool_id}", json=payload)
-            r.raise_for_status()
-            return r.json()
+        r = await self._client.patch(f"/spool/{spool_id}", **_json_body(payload))
+        r.raise_for_status()
+        return orjson.loads(r.content)
 
     async def delete_spool(self, spool_id):
         """Löscht eine Spule."""
-        async with httpx.AsyncClient(timeout=30) as c:
-            r = await c.delete(f"{self.base}/spool/{spool_id}")
-            r.raise_for_status()
-            return True
+        r = await self._client.delete(f"/spool/{spool_id}")
+        r.raise_for_status()
+        return True
 
 
 class SimplyPrintClient:
@@ -125,7 +158,54 @@ class SimplyPrintClient:
         
         if not token:
             logger.warning("SP_TOKEN nicht gesetzt. API-Aufrufe werden fehlschlagen!")
-    
+
+        # Ein langlebiger Client pro Instanz (Keep-Alive-Pool), Basis-URL und
+        # API-Key als Client-Defaults statt pro Request
+        self._client = httpx.AsyncClient(base_url=self.base, headers=self.headers, **_http_options())
+
+    async def aclose(self):
+        """Schließt den HTTP-Client und alle offenen Verbindungen."""
+        await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    def _unwrap(self, r: httpx.Response):
+        """
+        Prüft eine SimplyPrint-Response und gibt das JSON zurück.
+
+        Wirft bei HTTP-Fehlern (raise_for_status) und wenn die API
+        ``"status": false`` meldet.
+        """
+        # Bei Fehler: Zeige Response-Body für Debugging
+        if r.status_code != 200:
+            try:
+                error_data = orjson.loads(r.content)
+                logger.error(f"SimplyPrint API Error Response: {error_data}")
+            except:
+                logger.error(f"SimplyPrint API Error Response (raw): {r.text}")
+
+        r.raise_for_status()
+        data = orjson.loads(r.content)
+
+        # API Fehlerbehandlung
+        if not data.get("status"):
+            error_msg = data.get("message", "Unbekannter Fehler")
+            raise Exception(f"SimplyPrint API Fehler: {error_msg}")
+
+        return data
+
+    async def _get(self, path, **kwargs):
+        logger.debug("GET %s%s", self.base, path)
+        return self._unwrap(await self._client.get(path, **kwargs))
+
+    async def _post(self, path, payload, **kwargs):
+        logger.debug("POST %s%s", self.base, path)
+        return self._unwrap(await self._client.post(path, **_json_body(payload), **kwargs))
+
     async def list_filaments(self):
         """
         Listet alle Filamente auf.
@@ -135,20 +215,7 @@ class SimplyPrintClient:
         Returns:
             Dictionary mit 'filament' key, der ein Dictionary von Filamenten enthält
         """
-        async with httpx.AsyncClient(timeout=30, headers=self.headers) as c:
-            url = f"{self.base}/filament/GetFilament"
-            logger.debug(f"Lade Filamente von: {url}")
-
-            r = await c.get(url)
-            r.raise_for_status()
-            data = r.json()
-
-            # API Fehlerbehandlung
-            if not data.get("status"):
-                error_msg = data.get("message", "Unbekannter Fehler")
-                raise Exception(f"SimplyPrint API Fehler: {error_msg}")
-
-            return data
+        return await self._get("/filament/GetFilament")
 
     async def get_filament_types(self):
         """
@@ -159,27 +226,14 @@ class SimplyPrintClient:
         Returns:
             Dictionary mit allen Filament-Types
         """
-        async with httpx.AsyncClient(timeout=30, headers=self.headers) as c:
-            url = f"{self.base}/filament/type/Get"
-            logger.debug(f"Lade Filament-Types von: {url}")
-
-            r = await c.get(url)
-            r.raise_for_status()
-            data = r.json()
+        return await self._get("/filament/type/Get")
 
-            # API Fehlerbehandlung
-            if not data.get("status"):
-                error_msg = data.get("message", "Unbekannter Fehler")
-                raise Exception(f"SimplyPrint API Fehler: {error_msg}")
-
-            return data
-    
     async def create_filament(self, payload):
         """
         Erstellt ein neues Filament.
-        
+
         Endpoint: POST /{id}/filament/Create
-        
+
         Wichtige Payload-Felder:
         - color_name: str
         - color_hex: str (z.B. "#E5E5E5")
@@ -192,87 +246,147 @@ class SimplyPrintClient:
         - total_length_type: str ("kg" oder "m")
         - total_length: float
         """
-        async with httpx.AsyncClient(timeout=30, headers=self.headers) as c:
-            url = f"{self.base}/filament/Create"
-            logger.debug(f"Erstelle Filament bei: {url}")
-            
-            r = await c.post(url, json=payload)
-            r.raise_for_status()
-            data = r.json()
-            
-            if not data.get("status"):
-                error_msg = data.get("message", "Unbekannter Fehler")
-                raise Exception(f"SimplyPrint API Fehler: {error_msg}")
-            
-            return data
-    
+        return await self._post("/filament/Create", payload)
+
     async def create_spool(self, payload):
         """
         Erstellt eine neue Spule (veraltet - SimplyPrint verwaltet Spulen als Filamente).
-        
+
         In SimplyPrint sind "Spools" eigentlich Filamente.
         Diese Methode ist ein Alias für create_filament.
         """
         return await self.create_filament(payload)
-    
-    async def update_filament(self, filament_id: str, payload):
+
+    async def update_filament(self, filament_id, payload):
         """
         Aktualisiert ein bestehendes Filament.
-        
+
         Endpoint: POST /{id}/filament/Create?fid={filament_id}
-        
+
         Args:
-            filament_id: Die UID des Filaments (4-Zeichen Code)
+            filament_id: Die numerische ID des Filaments (int oder str)
             payload: Siehe create_filament für Felder
         """
-        async with httpx.AsyncClient(timeout=30, headers=self.headers) as c:
-            url = f"{self.base}/filament/Create?fid={filament_id}"
-            logger.debug(f"Aktualisiere Filament bei: {url}")
-
-            r = await c.post(url, json=payload)
-
-            # Bei Fehler: Zeige Response-Body für Debugging
-            if r.status_code != 200:
-                try:
-                    error_data = r.json()
-                    logger.error(f"SimplyPrint API Error Response: {error_data}")
-                except:
-                    logger.error(f"SimplyPrint API Error Response (raw): {r.text}")
+        return await self._post("/filament/Create", payload, params={"fid": filament_id})
 
-            r.raise_for_status()
-            data = r.json()
-
-            if not data.get("status"):
-                error_msg = data.get("message", "Unbekannter Fehler")
-                raise Exception(f"SimplyPrint API Fehler: {error_msg}")
-
-            return data
-    
     async def test_connection(self):
         """
         Testet die Verbindung zur SimplyPrint API.
-        
+
         Endpoint: GET /{id}/account/Test
-        
+
+        Interaktiv (Settings-Seite), daher knappe Timeouts und JSON nur bei 200.
+
         Returns:
             True wenn Verbindung erfolgreich, sonst False
         """
         try:
-            async with httpx.AsyncClient(timeout=10, headers=self.headers) as c:
-                url = f"{self.base}/account/Test"
-                logger.debug(f"Teste Verbindung zu: {url}")
-                
-                r = await c.get(url)
-                r.raise_for_status()
-                data = r.json()
-                
-                if data.get("status") and data.get("message") == "Your API key is valid!":
-                    logger.info("SimplyPrint API Verbindung erfolgreich")
-                    return True
-                else:
-                    logger.error(f"SimplyPrint API Test fehlgeschlagen: {data}")
-                    return False
-                    
+            r = await self._client.get("/account/Test", timeout=TEST_TIMEOUT)
+            if r.status_code != 200:
+                logger.error(f"SimplyPrint API Test fehlgeschlagen: HTTP {r.status_code}")
+                return False
+            data = orjson.loads(r.content)
         except Exception as e:
             logger.error(f"SimplyPrint API Test Fehler: {e}")
-            return False
\ No newline at end of file
+            return False
+
+        if data.get("status") and data.get("message") == "Your API key is valid!":
+            logger.info("SimplyPrint API Verbindung erfolgreich")
+            return True
+
+        logger.error(f"SimplyPrint API Test fehlgeschlagen: {data}")
+        return False
+
+
+# -------------------------------------------------------------------
+# Geteilte Instanzen (Web-Requests und Sync nutzen denselben Pool)
+# -------------------------------------------------------------------
+
+_spoolman_client = None
+_simplyprint_client = None
+
+# Laufende Nutzer (Sync, Web-Requests) und von reset_clients() ersetzte Clients:
+# diese werden erst geschlossen, wenn kein Nutzer sie mehr verwenden kann
+_users = 0
+_retired = []
+# Einstellungen, mit denen die aktuellen Clients gebaut wurden
+_config = None
+
+
+def _client_config() -> tuple:
+    """Einstellungen, die in die Clients eingehen (URLs, Token, Pool-Limits)."""
+    return (
+        S.get("SPOOLMAN_BASE"), S.get("SP_BASE"), S.get("SP_COMPANY_ID", ""),
+        S.get_secret("SP_TOKEN", ""), S.get("HTTP_MAX_CONN", "200"), S.get("HTTP_KEEPALIVE", "50"),
+    )
+
+
+def get_spoolman_client() -> SpoolmanClient:
+    """Gibt den geteilten SpoolmanClient zurück (wird bei Bedarf angelegt)."""
+    global _spoolman_client
+    if _spoolman_client is None:
+        _spoolman_client = SpoolmanClient()
+    return _spoolman_client
+
+
+def get_simplyprint_client() -> SimplyPrintClient:
+    """Gibt den geteilten SimplyPrintClient zurück (wird bei Bedarf angelegt)."""
+    global _simplyprint_client
+    if _simplyprint_client is None:
+        _simplyprint_client = SimplyPrintClient()
+    return _simplyprint_client
+
+
+@asynccontextmanager
+async def clients_in_use():
+    """
+    Markiert einen Nutzer der geteilten Clients (z. B. einen Sync-Lauf).
+
+    Innerhalb des Blocks geholte Clients bleiben offen, auch wenn
+    reset_clients() sie zwischenzeitlich ersetzt.
+    """
+    global _users
+    _users += 1
+    try:
+        yield
+    finally:
+        _users -= 1
+        if _users == 0:
+            await _close_retired()
+
+
+async def _close_retired():
+    while _retired:
+        await _retired.pop().aclose()
+
+
+async def close_clients():
+    """Schließt die geteilten Clients (Shutdown)."""
+    global _spoolman_client, _simplyprint_client, _config
+    old = (_spoolman_client, _simplyprint_client)
+    _spoolman_client = _simplyprint_client = None
+    _config = None
+    for client in old:
+        if client:
+            await client.aclose()
+    await _close_retired()
+
+
+async def reset_clients():
+    """
+    Baut die geteilten Clients neu auf, wenn sich URLs, Token oder Pool-Limits
+    geändert haben. Alte Clients werden erst nach dem letzten Nutzer geschlossen.
+    """
+    global _spoolman_client, _simplyprint_client, _config
+    config = _client_config()
+    if config == _config and _spoolman_client and _simplyprint_client:
+        return
+
+    old = [c for c in (_spoolman_client, _simplyprint_client) if c]
+    _spoolman_client = SpoolmanClient()
+    _simplyprint_client = SimplyPrintClient()
+    _config = config
+
+    _retired.extend(old)
+    if _users == 0:
+        await _close_retired()
@@ -1,12 +1,38 @@
-import os, sqlite3, datetime as dt
+import os, sqlite3, queue, datetime as dt
 from contextlib import contextmanager
+from functools import lru_cache
 DB_PATH = os.getenv("DB_PATH","/var/lib/spoolsync/spoolsync.db")
 
+# Wiederverwendete Connections (statt connect/close pro Session).
+# Jede Connection gehört immer nur einer Session gleichzeitig.
+POOL_SIZE = 4
+_pool = queue.LifoQueue(maxsize=POOL_SIZE)
+
+# Wird bei jedem init_db() erhöht; Caches über den DB-Inhalt (z. B. die
+# Datensatz-Hashes in sync.save_local_rows) verwerfen sich bei Änderung
+_generation = 0
+
+def db_generation():
+    return _generation
+
+def _apply_pragmas(conn):
+    """Per-Connection-Einstellungen (synchronous, Cache, mmap gelten nicht dateiweit)."""
+    conn.executescript("""
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-65536;
+    PRAGMA mmap_size=268435456;
+    PRAGMA busy_timeout=5000;
+    """)
+
 def init_db():
+    global _generation
+    _generation += 1
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
     with sqlite3.connect(DB_PATH) as c:
+        _apply_pragmas(c)
         c.executescript("""
-        PRAGMA journal_mode=WAL;
         CREATE TABLE IF NOT EXISTS filament(
           id INTEGER PRIMARY KEY,
           name TEXT NOT NULL,
@@ -40,46 +66,112 @@ def init_db():
           field TEXT, old_value TEXT, new_value TEXT,
           source TEXT, ts TEXT
         );
+        -- Konfliktziel für upsert_filaments (ON CONFLICT mit denselben Ausdrücken)
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_filament_key
+          ON filament(name, IFNULL(material,''), IFNULL(diameter_mm,0));
+        -- Dashboard: ORDER BY updated_at DESC LIMIT 50 / Statistiken
+        CREATE INDEX IF NOT EXISTS idx_filament_updated ON filament(updated_at DESC);
+        CREATE INDEX IF NOT EXISTS idx_spool_updated ON spool(updated_at DESC);
+        CREATE INDEX IF NOT EXISTS idx_spool_archived ON spool(archived);
         """)
 
-def now(): return dt.datetime.utcnow().isoformat()
+def now(): return dt.datetime.now(dt.timezone.utc).isoformat()
+
+def _connect():
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    _apply_pragmas(conn)
+    return conn
 
 @contextmanager
 def get_session():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
+        conn = _connect()
     try:
         yield conn
         conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
     finally:
-        conn.close()
+        try:
+            _pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
 
 Session = get_session
 
-def upsert_filament(conn, f):
-    row = conn.execute("SELECT id FROM filament WHERE name=? AND IFNULL(material,'')=? AND IFNULL(diameter_mm,0)=?",
-                       (f["name"], f.get("material",""), f.get("diameter_mm",0))).fetchone()
-    ts = now()
-    if row:
-        conn.execute("""UPDATE filament SET brand=?, density_g_cm3=?, color_hex=?, nominal_weight_g=?, updated_at=? WHERE id=?""",
-                     (f.get("brand"), f.get("density_g_cm3"), f.get("color_hex"), f.get("nominal_weight_g"), ts, row["id"]))
-        return row["id"]
-    cur = conn.execute("""INSERT INTO filament(name,brand,material,diameter_mm,density_g_cm3,color_hex,nominal_weight_g,created_at,updated_at)
-                          VALUES(?,?,?,?,?,?,?, ?, ?)""",
-                       (f["name"], f.get("brand"), f.get("material"), f.get("diameter_mm"), f.get("density_g_cm3"),
-                        f.get("color_hex"), f.get("nominal_weight_g"), ts, ts))
-    return cur.lastrowid
-
-def upsert_spool(conn, s):
-    row = conn.execute("SELECT id FROM spool WHERE lot_nr=?", (s.get("lot_nr"),)).fetchone() if s.get("lot_nr") else None
-    ts = now()
-    if row:
-        conn.execute("""UPDATE spool SET filament_id=?, spool_weight_g=?, price_eur=?, used_weight_g=?, archived=?, source=?, updated_at=? WHERE id=?""",
-                     (s["filament_id"], s.get("spool_weight_g"), s.get("price_eur"),
-                      s.get("used_weight_g",0), int(bool(s.get("archived",0))), s.get("source"), ts, row["id"]))
-        return row["id"]
-    cur = conn.execute("""INSERT INTO spool(filament_id,lot_nr,spool_weight_g,price_eur,used_weight_g,archived,source,created_at,updated_at)
-                          VALUES(?,?,?,?,?,?,?, ?, ?)""",
-                       (s["filament_id"], s.get("lot_nr"), s.get("spool_weight_g"), s.get("price_eur"),
-                        s.get("used_weight_g",0), int(bool(s.get("archived",0))), s.get("source"), ts, ts))
-    return cur.lastrowid
+@contextmanager
+def batch_session():
+    """Eine Schreib-Transaktion für viele Upserts (ein Commit statt einem pro Datensatz)."""
+    with get_session() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+
+UPSERT_FILAMENT_SQL = """
+INSERT INTO filament(name,brand,material,diameter_mm,density_g_cm3,color_hex,nominal_weight_g,created_at,updated_at)
+VALUES(?,?,?,?,?,?,?,?,?)
+ON CONFLICT(name, IFNULL(material,''), IFNULL(diameter_mm,0)) DO UPDATE SET
+  brand=excluded.brand, density_g_cm3=excluded.density_g_cm3,
+  color_hex=excluded.color_hex, nominal_weight_g=excluded.nominal_weight_g,
+  updated_at=excluded.updated_at
+"""
+
+UPSERT_SPOOL_SQL = """
+INSERT INTO spool(filament_id,lot_nr,spool_weight_g,price_eur,used_weight_g,archived,source,created_at,updated_at)
+VALUES(?,?,?,?,?,?,?,?,?)
+ON CONFLICT(lot_nr) DO UPDATE SET
+  filament_id=excluded.filament_id, spool_weight_g=excluded.spool_weight_g,
+  price_eur=excluded.price_eur, used_weight_g=excluded.used_weight_g,
+  archived=excluded.archived, source=excluded.source, updated_at=excluded.updated_at
+"""
+
+FILAMENT_IDS_SQL = """
+SELECT id, name, IFNULL(material,'') AS material, IFNULL(diameter_mm,0) AS diameter_mm
+FROM filament WHERE name IN ({})
+"""
+
+ID_LOOKUP_CHUNK = 500
+
+@lru_cache(maxsize=32)
+def _filament_ids_sql(n):
+    return FILAMENT_IDS_SQL.format(",".join("?" * n))
+
+def filament_key(f):
+    """Schlüssel wie im Konflikt-Index: (name, IFNULL(material,''), IFNULL(diameter_mm,0))."""
+    return (f["name"], f.get("material") or "", f.get("diameter_mm") or 0)
+
+def _filament_params(f, ts):
+    return (f["name"], f.get("brand"), f.get("material"), f.get("diameter_mm"), f.get("density_g_cm3"),
+            f.get("color_hex"), f.get("nominal_weight_g"), ts, ts)
+
+def _spool_params(s, ts):
+    return (s["filament_id"], s.get("lot_nr"), s.get("spool_weight_g"), s.get("price_eur"),
+            s.get("used_weight_g",0), int(bool(s.get("archived",0))), s.get("source"), ts, ts)
+
+def upsert_filaments(conn, filaments, ts=None):
+    """
+    Bulk-Upsert per executemany. Gibt {(name, material, diameter_mm): id} zurück,
+    mit denselben IFNULL-Defaults wie der Konflikt-Index.
+    """
+    ts = ts or now()
+    # Doppelte Schlüssel zusammenfassen (letzter Datensatz gewinnt)
+    unique = {filament_key(f): f for f in filaments}
+    if not unique:
+        return {}
+    conn.executemany(UPSERT_FILAMENT_SQL, [_filament_params(f, ts) for f in unique.values()])
+    names = list({key[0] for key in unique})
+    ids = {}
+    for i in range(0, len(names), ID_LOOKUP_CHUNK):  # unter SQLITE_MAX_VARIABLE_NUMBER bleiben
+        chunk = names[i:i + ID_LOOKUP_CHUNK]
+        # Volle Chunks ergeben immer denselben SQL-Text -> Statement-Cache greift
+        for r in conn.execute(_filament_ids_sql(len(chunk)), chunk):
+            ids[(r["name"], r["material"], r["diameter_mm"])] = r["id"]
+    return ids
+
+def upsert_spools(conn, spools, ts=None):
+    """Bulk-Upsert per executemany (Spulen brauchen bereits gesetzte filament_id)."""
+    ts = ts or now()
+    conn.executemany(UPSERT_SPOOL_SQL, [_spool_params(s, ts) for s in spools])
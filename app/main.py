@@ -1,18 +1,41 @@
-import os, datetime as dt
-import json
+import os, re, time, datetime as dt
+import orjson
 from fastapi import FastAPI, Request, Form, Depends
-from fastapi.responses import HTMLResponse, RedirectResponse, Response, StreamingResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Route
 import asyncio
 from pathlib import Path
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 
 from .db import init_db, get_session
 from .web import templates
-from .sync import start_scheduler, reconfigure_scheduler, run_sync_once, sync_status
+from .cache import dashboard_cache
+from .sync import start_scheduler, stop_scheduler, reconfigure_scheduler, run_sync_once, sync_status
 from . import settings as S
-from .clients import SpoolmanClient, SimplyPrintClient
+from .clients import (
+    SpoolmanClient, SimplyPrintClient,
+    get_spoolman_client, get_simplyprint_client, reset_clients, close_clients, clients_in_use,
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Ein gemeinsamer Lebenszyklus für DB, Settings, API-Clients und Scheduler."""
+    init_db()
+    S.init()
+    await reset_clients()
+    start_scheduler()
+    try:
+        yield
+    finally:
+        stop_scheduler()
+        await close_clients()
+
 
-app = FastAPI(title="SpoolSync")
+# JSON-Antworten (health, status, sync, api/logs) per orjson serialisieren
+app = FastAPI(title="SpoolSync", default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # Static dir sicherstellen
 static_dir = os.path.join(os.path.dirname(__file__), "static")
@@ -30,47 +53,77 @@ def get_db():
         yield db
 
 
-# -------------------------------------------------------------------
-# Events
-# -------------------------------------------------------------------
+async def get_spoolman() -> AsyncIterator[SpoolmanClient]:
+    """FastAPI Dependency: geteilter SpoolmanClient (siehe clients.py)."""
+    # Bleibt bis zum Ende des Requests offen, auch wenn Settings gespeichert werden
+    async with clients_in_use():
+        yield get_spoolman_client()
 
-@app.on_event("startup")
-async def startup():
-    init_db()
-    start_scheduler()
 
+async def get_simplyprint() -> AsyncIterator[SimplyPrintClient]:
+    """FastAPI Dependency: geteilter SimplyPrintClient (siehe clients.py)."""
+    async with clients_in_use():
+        yield get_simplyprint_client()
 
-# -------------------------------------------------------------------
-# Routes
-# -------------------------------------------------------------------
 
-@app.get("/health")
-def health():
-    return {"ok": True, "time": dt.datetime.utcnow().isoformat()}
+# Sekundengenauer Zeitstempel für /health und /sync (Liveness-Probes ~1 Hz)
+_ts_cache = [0, ""]
 
 
-@app.get("/", response_class=HTMLResponse)
-async def dashboard(request: Request):
-    # Hole Live-Daten von Spoolman für korrekte Statistiken
-    try:
-        smc = SpoolmanClient()
-        spoolman_spools = await smc.list_spools()
+def now_iso() -> str:
+    t = int(time.time())
+    if t != _ts_cache[0]:
+        _ts_cache[:] = [t, dt.datetime.fromtimestamp(t, dt.timezone.utc).isoformat()]
+    return _ts_cache[1]
 
-        # Zähle aktive und archivierte Spulen direkt von Spoolman
-        active_count = sum(1 for s in spoolman_spools if not s.get("archived", False))
-        archived_count = sum(1 for s in spoolman_spools if s.get("archived", False))
-        total_used = sum(s.get("used_weight", 0) for s in spoolman_spools)
-        total_spools = len(spoolman_spools)
-        spoolman_ok = True
-    except:
-        # Fallback: Wird später aus DB geholt
-        spoolman_ok = False
-        active_count = 0
-        archived_count = 0
-        total_used = 0
-        total_spools = 0
 
-    # Hole DB-Daten NACH dem await (neuer Thread-Context)
+# Log-Level in "... - ERROR - ..." (logging) bzw. "ERROR: ..." (uvicorn)
+_LEVEL_RE = re.compile(r" - (ERROR|WARNING|DEBUG) - |(ERROR|WARNING|DEBUG):")
+# Wie bisher gewinnt das schwerwiegendste Level, nicht das erste in der Zeile
+_LEVEL_PRIORITY = ("ERROR", "WARNING", "DEBUG")
+
+
+def _parse_level(line: str) -> str:
+    found = {a or b for a, b in _LEVEL_RE.findall(line)}
+    for level in _LEVEL_PRIORITY:
+        if level in found:
+            return level.lower()
+    return "info"
+
+
+# asctime des logging-Formats hat feste Breite: "2024-01-31 12:00:00,123"
+_TS_LEN = 23
+
+
+def _parse_timestamp(line: str) -> str:
+    return line[:_TS_LEN] if line[_TS_LEN:_TS_LEN + 3] == " - " else ""
+
+
+def tail(path, n: int, block_size: int = 8192):
+    """
+    Gibt die letzten n Zeilen einer Datei zurück.
+
+    Liest blockweise vom Dateiende rückwärts (Blockgröße verdoppelt sich),
+    bis genug Zeilenumbrüche gefunden sind – statt die ganze Datei zu lesen.
+    """
+    size = os.stat(path).st_size
+    with open(path, "rb") as f:
+        while True:
+            offset = max(0, size - block_size)
+            f.seek(offset)
+            data = f.read(size - offset)
+            if offset == 0 or data.count(b"\n") > n:
+                break
+            block_size *= 2
+    lines = data.decode("utf-8", errors="ignore").splitlines()
+    # Erste Zeile ist ggf. abgeschnitten, sofern nicht am Dateianfang
+    if offset > 0:
+        lines = lines[1:]
+    return lines[-n:] if n > 0 else []
+
+
+def _load_dashboard_cache():
+    """Liest Filamente, Spulen und Statistiken aus dem lokalen Cache (blockierend)."""
     with get_session() as db:
         # Filamente aus Cache (für Performance)
         filaments = db.execute(
@@ -92,32 +145,98 @@ async def dashboard(request: Request):
             """
         ).fetchall()
 
-        # Fallback auf Cache wenn Spoolman nicht erreichbar
-        if not spoolman_ok:
-            active_count = db.execute("SELECT COUNT(*) as count FROM spool WHERE archived = 0").fetchone()["count"]
-            archived_count = db.execute("SELECT COUNT(*) as count FROM spool WHERE archived = 1").fetchone()["count"]
-            total_used = db.execute("SELECT COALESCE(SUM(used_weight_g), 0) as total FROM spool").fetchone()["total"]
-            total_spools = db.execute("SELECT COUNT(*) as count FROM spool").fetchone()["count"]
-
-        # Statistiken mit Live-Daten von Spoolman (oder Fallback Cache)
-        stats = {
-            "total_filaments": db.execute("SELECT COUNT(*) as count FROM filament").fetchone()["count"],
-            "total_spools": total_spools,
-            "active_spools": active_count,
-            "archived_spools": archived_count,
-            "total_used_weight": total_used,
-            "last_sync": S.get("LAST_SYNC_TIME", "0"),
-        }
-
-    return templates.TemplateResponse(
-        "dashboard.html",
-        {
-            "request": request,
-            "filaments": filaments,
-            "spools": spools,
-            "stats": stats,
-        },
-    )
+        # Alle Cache-Statistiken in einer Abfrage (ein Scan über spool)
+        counts = db.execute(
+            """
+            SELECT
+                (SELECT COUNT(*) FROM filament) AS total_filaments,
+                COUNT(*) AS total_spools,
+                COALESCE(SUM(archived = 0), 0) AS active_spools,
+                COALESCE(SUM(archived = 1), 0) AS archived_spools,
+                COALESCE(SUM(used_weight_g), 0) AS total_used_weight
+            FROM spool
+            """
+        ).fetchone()
+
+    return filaments, spools, counts, S.get("LAST_SYNC_TIME", "0")
+
+
+# -------------------------------------------------------------------
+# Routes
+# -------------------------------------------------------------------
+
+@app.get("/health")
+def health():
+    return {"ok": True, "time": now_iso()}
+
+
+_dashboard_lock = asyncio.Lock()
+
+
+@app.get("/", response_class=HTMLResponse)
+async def dashboard(request: Request, smc: SpoolmanClient = Depends(get_spoolman)):
+    context = dashboard_cache.get("dashboard")
+    if context is None:
+        # Nur ein Request baut den Kontext, parallele warten auf dessen Ergebnis
+        async with _dashboard_lock:
+            context = dashboard_cache.get("dashboard")
+            if context is None:
+                context = await _build_dashboard_context(smc)
+                dashboard_cache.set("dashboard", context)
+
+    return templates.TemplateResponse("dashboard.html", {"request": request, **context})
+
+
+async def _build_dashboard_context(smc: SpoolmanClient):
+    """Sammelt Live-Statistiken von Spoolman plus Cache-Daten fürs Dashboard."""
+    # Hole Live-Daten von Spoolman für korrekte Statistiken
+    try:
+        spoolman_spools = await smc.list_spools()
+
+        # Zähle aktive und archivierte Spulen direkt von Spoolman (ein Durchlauf)
+        active_count = archived_count = 0
+        total_used = 0
+        for s in spoolman_spools:
+            if s.get("archived", False):
+                archived_count += 1
+            else:
+                active_count += 1
+            total_used += s.get("used_weight", 0)
+        total_spools = len(spoolman_spools)
+        spoolman_ok = True
+    except:
+        # Fallback: Wird später aus DB geholt
+        spoolman_ok = False
+        active_count = 0
+        archived_count = 0
+        total_used = 0
+        total_spools = 0
+
+    # DB-Abfragen im Threadpool, damit der Event-Loop frei bleibt
+    filaments, spools, counts, last_sync = await run_in_threadpool(_load_dashboard_cache)
+
+    # Fallback auf Cache wenn Spoolman nicht erreichbar
+    if not spoolman_ok:
+        active_count = counts["active_spools"]
+        archived_count = counts["archived_spools"]
+        total_used = counts["total_used_weight"]
+        total_spools = counts["total_spools"]
+
+    # Statistiken mit Live-Daten von Spoolman (oder Fallback Cache)
+    stats = {
+        "total_filaments": counts["total_filaments"],
+        "total_spools": total_spools,
+        "active_spools": active_count,
+        "archived_spools": archived_count,
+        "total_used_weight": total_used,
+        "last_sync": last_sync,
+    }
+
+    return {
+        "filaments": filaments,
+        "spools": spools,
+        "stats": stats,
+    }
 
 
 @app.get("/settings", response_class=HTMLResponse)
@@ -127,56 +246,86 @@ def settings_view(request: Request):
         "SP_BASE": S.get("SP_BASE"),
         "SP_COMPANY_ID": S.get("SP_COMPANY_ID"),
         "SYNC_INTERVAL_SECONDS": S.get("SYNC_INTERVAL_SECONDS"),
+        "SYNC_INTERVAL_MAX_SECONDS": S.get("SYNC_INTERVAL_MAX_SECONDS"),
         "EPSILON_GRAMS": S.get("EPSILON_GRAMS"),
         "DRY_RUN": S.get("DRY_RUN", "false"),
+        "HTTP_MAX_CONN": S.get("HTTP_MAX_CONN"),
+        "HTTP_KEEPALIVE": S.get("HTTP_KEEPALIVE"),
         "SP_TOKEN_SET": bool(S.get_secret("SP_TOKEN")),
     }
     return templates.TemplateResponse("settings.html", {"request": request, "cfg": data})
 
 
-@app.post("/settings")
-def settings_save(
-    SPOOLMAN_BASE: str = Form(...),
-    SP_BASE: str = Form(...),
-    SP_COMPANY_ID: str = Form(...),
-    SYNC_INTERVAL_SECONDS: int = Form(...),
-    EPSILON_GRAMS: float = Form(...),
-    DRY_RUN: str = Form("false"),
-    SP_TOKEN: str = Form(""),
+def _save_settings(
+    SPOOLMAN_BASE, SP_BASE, SP_COMPANY_ID, SYNC_INTERVAL_SECONDS, SYNC_INTERVAL_MAX_SECONDS,
+    EPSILON_GRAMS, DRY_RUN, SP_TOKEN, HTTP_MAX_CONN, HTTP_KEEPALIVE,
 ):
+    """Schreibt die Formularwerte (blockierende SQLite-Writes, daher im Thread)."""
     S.set("SPOOLMAN_BASE", SPOOLMAN_BASE.strip())
     S.set("SP_BASE", SP_BASE.strip())
     S.set("SP_COMPANY_ID", SP_COMPANY_ID.strip())
     S.set("SYNC_INTERVAL_SECONDS", str(max(30, int(SYNC_INTERVAL_SECONDS))))
+    S.set("SYNC_INTERVAL_MAX_SECONDS", str(max(0, int(SYNC_INTERVAL_MAX_SECONDS))))
     S.set("EPSILON_GRAMS", f"{max(0.01, float(EPSILON_GRAMS)):.2f}")
     S.set("DRY_RUN", "true" if DRY_RUN == "true" else "false")
+    S.set("HTTP_MAX_CONN", str(max(1, int(HTTP_MAX_CONN))))
+    S.set("HTTP_KEEPALIVE", str(max(1, min(int(HTTP_KEEPALIVE), int(HTTP_MAX_CONN)))))
     if SP_TOKEN.strip():
         S.set_secret("SP_TOKEN", SP_TOKEN.strip())
+
+
+@app.post("/settings")
+async def settings_save(
+    SPOOLMAN_BASE: str = Form(...),
+    SP_BASE: str = Form(...),
+    SP_COMPANY_ID: str = Form(...),
+    SYNC_INTERVAL_SECONDS: int = Form(...),
+    SYNC_INTERVAL_MAX_SECONDS: int = Form(0),
+    EPSILON_GRAMS: float = Form(...),
+    DRY_RUN: str = Form("false"),
+    SP_TOKEN: str = Form(""),
+    HTTP_MAX_CONN: int = Form(200),
+    HTTP_KEEPALIVE: int = Form(50),
+):
+    # Writes nicht auf dem Event-Loop (settings._lock wird auch im Threadpool gehalten)
+    await asyncio.to_thread(
+        _save_settings,
+        SPOOLMAN_BASE, SP_BASE, SP_COMPANY_ID, SYNC_INTERVAL_SECONDS, SYNC_INTERVAL_MAX_SECONDS,
+        EPSILON_GRAMS, DRY_RUN, SP_TOKEN, HTTP_MAX_CONN, HTTP_KEEPALIVE,
+    )
+    await reset_clients()
+    dashboard_cache.clear()
     reconfigure_scheduler()
     return RedirectResponse("/settings?saved=1", status_code=303)
 
 
 @app.post("/settings/test")
-async def settings_test():
+async def settings_test(
+    smc: SpoolmanClient = Depends(get_spoolman),
+    spc: SimplyPrintClient = Depends(get_simplyprint),
+):
     ok = {"spoolman": False, "simplyprint": False, "msg": ""}
 
+    # Beide Tests parallel (Wartezeit = langsamerer der beiden)
+    sm_res, sp_res = await asyncio.gather(
+        smc.list_spools(),
+        spc.test_connection(),
+        return_exceptions=True,
+    )
+
     # Test Spoolman
-    try:
-        smc = SpoolmanClient()
-        await smc.list_spools()
+    if isinstance(sm_res, Exception):
+        ok["msg"] += f"Spoolman Fehler: {str(sm_res)[:100]}... "
+    else:
         ok["spoolman"] = True
-    except Exception as e:
-        ok["msg"] += f"Spoolman Fehler: {str(e)[:100]}... "
 
     # Test SimplyPrint
-    try:
-        spc = SimplyPrintClient()
-        result = await spc.test_connection()
-        ok["simplyprint"] = result
-        if not result:
+    if isinstance(sp_res, Exception):
+        ok["msg"] += f"SimplyPrint Fehler: {str(sp_res)[:100]}... "
+    else:
+        ok["simplyprint"] = sp_res
+        if not sp_res:
             ok["msg"] += "SimplyPrint: API-Key ungültig oder Company ID falsch. "
-    except Exception as e:
-        ok["msg"] += f"SimplyPrint Fehler: {str(e)[:100]}... "
 
     return ok
 
@@ -185,13 +334,17 @@ async def settings_test():
 async def sync_now():
     """Manueller Sync-Trigger (z. B. Button im UI)."""
     await run_sync_once()
-    return {"ok": True, "ts": dt.datetime.utcnow().isoformat()}
+    return {"ok": True, "ts": now_iso()}
+
+
+# Konstante Antwort, wird für jede Icon-Anfrage wiederverwendet
+_FAVICON_RESPONSE = Response(status_code=204)
 
 
 @app.get("/favicon.ico")
 def favicon():
     # verhindert 500/404 Spam bei Browser-Icon-Anfragen
-    return Response(status_code=204)
+    return _FAVICON_RESPONSE
 
 
 @app.get("/status")
@@ -235,33 +388,20 @@ async def get_logs(lines: int = 200, level: str = "all"):
             continue
 
         try:
-            # Lese letzte N Zeilen
-            with open(log_file, "r", encoding="utf-8", errors="ignore") as f:
-                file_lines = f.readlines()
-
-            # Nimm die letzten 'lines' Zeilen
-            recent_lines = file_lines[-lines:] if len(file_lines) > lines else file_lines
-
-            for line in recent_lines:
+            # Lese nur die letzten N Zeilen (vom Dateiende rückwärts)
+            for line in tail(log_file, lines):
                 line = line.strip()
                 if not line:
                     continue
 
-                # Parse Log-Level
-                log_level = "info"
-                if " - ERROR - " in line or "ERROR:" in line:
-                    log_level = "error"
-                elif " - WARNING - " in line or "WARNING:" in line:
-                    log_level = "warning"
-                elif " - DEBUG - " in line or "DEBUG:" in line:
-                    log_level = "debug"
+                log_level = _parse_level(line)
 
                 # Filter nach Level
                 if level != "all" and log_level != level.lower():
                     continue
 
                 log_entries.append({
-                    "timestamp": line.split(" - ")[0] if " - " in line else "",
+                    "timestamp": _parse_timestamp(line),
                     "level": log_level,
                     "message": line,
                 })
@@ -281,67 +421,100 @@ async def get_logs(lines: int = 200, level: str = "all"):
     }
 
 
-@app.get("/api/logs/stream")
-async def stream_logs(request: Request):
+class LogStreamASGI:
     """
     Server-Sent Events für Live-Log-Updates.
-    """
-    async def event_generator():
-        log_file = Path("/var/log/spoolsync/app.err")
-
-        # Fallback für Development
-        if not log_file.exists():
-            log_file = Path("app.log")
 
-        # Starte am Ende der Datei
-        if log_file.exists():
-            with open(log_file, "r") as f:
-                f.seek(0, 2)  # Gehe zum Ende
-                position = f.tell()
-        else:
-            position = 0
+    Reiner ASGI-Endpoint (ohne StreamingResponse): die Log-Datei bleibt über
+    die gesamte Verbindung geöffnet, pro Intervall werden nur neue Zeilen
+    gelesen und gesammelt in einem Body-Chunk gesendet. Log-Rotation wird
+    per Inode-/Größenvergleich erkannt und die neue Datei geöffnet.
+    """
 
-        while True:
-            # Check ob Client noch verbunden ist
-            if await request.is_disconnected():
-                break
+    def __init__(self, poll_interval: float = 2.0, heartbeat_interval: float = 15.0):
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
 
-            try:
-                if log_file.exists():
-                    with open(log_file, "r", encoding="utf-8", errors="ignore") as f:
-                        f.seek(position)
-                        new_lines = f.readlines()
-                        position = f.tell()
+    @staticmethod
+    def _log_file() -> Path:
+        log_file = Path("/var/log/spoolsync/app.err")
+        # Fallback für Development
+        return log_file if log_file.exists() else Path("app.log")
 
-                        for line in new_lines:
+    @staticmethod
+    def _rotated(f, log_file: Path) -> bool:
+        """True, wenn die Datei hinter dem offenen Handle ersetzt, gelöscht oder gekürzt wurde."""
+        try:
+            st = os.stat(log_file)
+        except FileNotFoundError:
+            return True
+        return st.st_ino != os.fstat(f.fileno()).st_ino or st.st_size < f.tell()
+
+    async def __call__(self, scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache"),
+                (b"connection", b"keep-alive"),
+            ],
+        })
+
+        # Disconnect parallel überwachen, statt jede Runde danach zu fragen
+        disconnected = asyncio.Event()
+
+        async def watch_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+
+        watcher = asyncio.create_task(watch_disconnect())
+        log_file = self._log_file()
+        f = None
+        idle = 0.0
+        try:
+            # Starte am Ende der Datei
+            if log_file.exists():
+                f = open(log_file, "r", encoding="utf-8", errors="ignore")
+                f.seek(0, 2)
+
+            while not disconnected.is_set():
+                chunk = ""
+                try:
+                    if f is not None and self._rotated(f, log_file):
+                        # Rotiert/gekürzt: neue Datei wird von vorne gelesen
+                        f.close()
+                        f = None
+                    if f is None and log_file.exists():
+                        f = open(log_file, "r", encoding="utf-8", errors="ignore")
+                    if f is not None:
+                        for line in f.readlines():
                             line = line.strip()
                             if line:
-                                # Parse Log-Level
-                                log_level = "info"
-                                if " - ERROR - " in line:
-                                    log_level = "error"
-                                elif " - WARNING - " in line:
-                                    log_level = "warning"
-                                elif " - DEBUG - " in line:
-                                    log_level = "debug"
-
-                                data = json.dumps({"level": log_level, "message": line})
-                                yield f"data: {data}\n\n"
-
-                # Sende Heartbeat alle 15 Sekunden
-                yield f": heartbeat\n\n"
-
-            except Exception as e:
-                data = json.dumps({"level": "error", "message": f"Stream error: {str(e)}"})
-                yield f"data: {data}\n\n"
-
-            await asyncio.sleep(2)  # Check alle 2 Sekunden
-
-    return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-        }
-    )
\ No newline at end of file
+                                data = orjson.dumps({"level": _parse_level(line), "message": line}).decode()
+                                chunk += f"data: {data}\n\n"
+                except Exception as e:
+                    data = orjson.dumps({"level": "error", "message": f"Stream error: {str(e)}"}).decode()
+                    chunk += f"data: {data}\n\n"
+
+                # Heartbeat nur, wenn länger nichts gesendet wurde
+                if chunk:
+                    idle = 0.0
+                elif idle >= self.heartbeat_interval:
+                    chunk = ": heartbeat\n\n"
+                    idle = 0.0
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+
+                try:
+                    await asyncio.wait_for(disconnected.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    idle += self.poll_interval
+        finally:
+            watcher.cancel()
+            if f is not None:
+                f.close()
+
+
+app.router.routes.append(Route("/api/logs/stream", LogStreamASGI()))
@@ -1,4 +1,5 @@
-import os, sqlite3, datetime as dt
+import os, sqlite3, threading, datetime as dt
+from .cache import TTLCache
 DB_PATH = os.getenv("DB_PATH","/var/lib/spoolsync/spoolsync.db")
 
 DEFAULTS = {
@@ -6,41 +7,76 @@ DEFAULTS = {
   "SP_BASE": "https://api.simplyprint.io",
   "SP_COMPANY_ID": "",  # Muss vom Benutzer gesetzt werden
   "SYNC_INTERVAL_SECONDS": "300",
+  "SYNC_INTERVAL_MAX_SECONDS": "0",  # Obergrenze für Leerlauf-Backoff, 0 = festes Intervall
   "EPSILON_GRAMS": "0.5",
   "DRY_RUN": "false",
+  "VERIFY_SIMPLYPRINT": "false",  # Nach Updates Filament-Liste neu laden und loggen
+  "HTTP_MAX_CONN": "200",
+  "HTTP_KEEPALIVE": "50",
 }
 
-def now(): return dt.datetime.utcnow().isoformat()
+def now(): return dt.datetime.now(dt.timezone.utc).isoformat()
 
-def _conn():
-    c = sqlite3.connect(DB_PATH)
-    c.row_factory = sqlite3.Row
-    with c:
+# Kurzlebiger Lese-Cache: get()/get_secret() werden im Sync und in jedem
+# Request mehrfach aufgerufen; set()/set_secret() invalidieren den Key.
+_cache = TTLCache(ttl=5)
+_MISSING = object()
+
+# Eine langlebige Connection (Autocommit) statt connect() pro Zugriff;
+# Zugriffe aus Threadpool und Event-Loop werden per Lock serialisiert
+_db = None
+_lock = threading.Lock()
+
+def init():
+    """Legt die Tabellen einmalig an (beim Start, nicht bei jedem Zugriff)."""
+    with _lock:
+        c = _conn()
         c.execute("CREATE TABLE IF NOT EXISTS settings(key TEXT PRIMARY KEY, value TEXT, updated_at TEXT)")
         c.execute("CREATE TABLE IF NOT EXISTS secrets(key TEXT PRIMARY KEY, value TEXT, updated_at TEXT)")
-    return c
+        _cache.clear()
 
-def get(key, default=None):
-    with _conn() as c:
-        r = c.execute("SELECT value FROM settings WHERE key=?", (key,)).fetchone()
-        if r: return r["value"]
-    return DEFAULTS.get(key, default)
+def _conn():
+    """Gibt die geteilte Connection zurück (beim ersten Zugriff geöffnet); nur unter _lock aufrufen."""
+    global _db
+    if _db is None:
+        _db = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+        _db.row_factory = sqlite3.Row
+        _db.execute("PRAGMA journal_mode=WAL")
+        _db.execute("PRAGMA synchronous=NORMAL")
+        _db.execute("PRAGMA busy_timeout=5000")
+    return _db
 
-def set(key, value):
-    with _conn() as c:
-        c.execute("""INSERT INTO settings(key,value,updated_at)
+def _lookup(table, key):
+    cache_key = (table, key)
+    value = _cache.get(cache_key, _MISSING)
+    if value is _MISSING:
+        # Lesen und Cache füllen unter demselben Lock wie set(): sonst könnte ein
+        # gleichzeitiges set() zwischen beidem landen und der alte Wert bliebe gecacht
+        with _lock:
+            r = _conn().execute(f"SELECT value FROM {table} WHERE key=?", (key,)).fetchone()
+            value = r["value"] if r else None
+            _cache.set(cache_key, value)
+    return value
+
+def _upsert(table, key, value):
+    with _lock:
+        _conn().execute(f"""INSERT INTO {table}(key,value,updated_at)
                      VALUES(?,?,?) ON CONFLICT(key) DO UPDATE SET
                      value=excluded.value, updated_at=excluded.updated_at""",
                   (key, value, now()))
+        _cache.pop((table, key))
+
+def get(key, default=None):
+    value = _lookup("settings", key)
+    if value is not None: return value
+    return DEFAULTS.get(key, default)
+
+def set(key, value):
+    _upsert("settings", key, value)
 
 def get_secret(key, default=""):
-    with _conn() as c:
-        r = c.execute("SELECT value FROM secrets WHERE key=?", (key,)).fetchone()
-        return r["value"] if r else default
+    value = _lookup("secrets", key)
+    return value if value is not None else default
 
 def set_secret(key, value):
-    with _conn() as c:
-        c.execute("""INSERT INTO secrets(key,value,updated_at)
-                     VALUES(?,?,?) ON CONFLICT(key) DO UPDATE SET
-                     value=excluded.value, updated_at=excluded.updated_at""",
-                  (key, value, now()))
\ No newline at end of file
+    _upsert("secrets", key, value)
@@ -1,18 +1,31 @@
+import asyncio
+import hashlib
 import math
 import logging
+import re
 import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
 from datetime import datetime, timezone
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Tuple
+import orjson
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from .db import get_session, upsert_filament, upsert_spool
-from .clients import SpoolmanClient, SimplyPrintClient
+from .db import batch_session, db_generation, filament_key, now, upsert_filaments, upsert_spools
+from .clients import SpoolmanClient, SimplyPrintClient, clients_in_use, get_spoolman_client, get_simplyprint_client
 from . import settings as S
+from .cache import dashboard_cache
 
 # Logging konfigurieren
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 _scheduler = None
+SYNC_JOB_ID = "sync"
+# Aktuelles Intervall des Sync-Jobs (bei Leerlauf ggf. verlängert)
+_current_interval: Optional[int] = None
 
 
 class SyncStatus:
@@ -35,6 +48,8 @@ class SyncStatus:
         self.is_running = True
         self.last_run = datetime.now(timezone.utc).isoformat()
         self.current_step = "Initialisierung..."
+        # Zahlen des vorigen Laufs für skip() aufheben
+        self._previous_stats = self.stats
         self.stats = {"synced": 0, "created": 0, "updated": 0, "archived": 0, "errors": 0}
 
     def stop(self, success: bool = True, error: str = None):
@@ -45,6 +60,12 @@ class SyncStatus:
         if error:
             self.last_error = error
 
+    def skip(self):
+        """Beendet einen übersprungenen Lauf; die Zahlen des letzten echten Laufs bleiben stehen."""
+        self.stats = self._previous_stats
+        self.stop(success=True)
+        self.current_step = "Keine Änderungen – übersprungen"
+
     def set_step(self, step: str):
         self.current_step = step
 
@@ -77,30 +98,63 @@ class SyncStatus:
 sync_status = SyncStatus()
 
 
+# Max. gleichzeitig synchronisierte Filamente (begrenzt parallele API-Requests)
+SYNC_CONCURRENCY = 10
+
+
 def EPS() -> float:
     """Epsilon-Schwellenwert für Gewichtsvergleiche."""
     return float(S.get("EPSILON_GRAMS", "0.5"))
 
 
+def DRY_RUN() -> bool:
+    """True, wenn nur simuliert und nichts geschrieben werden soll."""
+    return S.get("DRY_RUN", "false") == "true"
+
+
+@dataclass(frozen=True)
+class SyncConfig:
+    """Einstellungen eines Sync-Laufs (einmal gelesen, ändern sich während des Laufs nicht)."""
+    dry_run: bool
+    epsilon_grams: float
+
+    @classmethod
+    def from_settings(cls) -> "SyncConfig":
+        return cls(dry_run=DRY_RUN(), epsilon_grams=EPS())
+
+
+# Volumen von 1 m Filament in cm³ = π · (d_mm / 20)² · 100 = π/4 · d_mm²
+_GPM_K = math.pi / 4
+_GPM_PLA_175 = 2.98  # = round(_GPM_K * 1.75² * 1.24, 2)
+
+
 def grams_per_meter(density_g_cm3: float, diameter_mm: float) -> Optional[float]:
     """Berechnet Gramm pro Meter Filament."""
     if not density_g_cm3 or not diameter_mm:
         return None
-    r_cm = (diameter_mm / 10) / 2
-    vol_cm3 = math.pi * r_cm * r_cm * 100
-    return round(vol_cm3 * density_g_cm3, 2)
+    # Häufigster Fall (PLA 1,75 mm) ohne Rundung und Cache-Lookup
+    if density_g_cm3 == 1.24 and diameter_mm == 1.75:
+        return _GPM_PLA_175
+    # Gerundet, damit Float-Rauschen die Cache-Keys nicht auffächert
+    return _grams_per_meter(round(density_g_cm3, 4), round(diameter_mm, 4))
+
+
+@lru_cache(maxsize=256)
+def _grams_per_meter(density_g_cm3: float, diameter_mm: float) -> float:
+    return round(_GPM_K * diameter_mm * diameter_mm * density_g_cm3, 2)
+
+
+# Gültige Hex-Farben (#RRGGBB), "#" optional; Spoolman lehnt kürzere color_hex ab
+_HEX_COLOR_RE = re.compile(r"#?([0-9A-Fa-f]{6})")
 
 
 def normalize_color(color: Any) -> Optional[str]:
     """Normalisiert Farbangaben zu Hex-Format."""
     if not color:
         return None
-    color_str = str(color).strip()
-    if color_str.startswith('#'):
-        return color_str
-    if len(color_str) == 6:
-        return f"#{color_str}"
-    return None
+    # Validieren und Extrahieren in einem Schritt, Schreibweise beibehalten
+    m = _HEX_COLOR_RE.fullmatch(str(color).strip())
+    return f"#{m.group(1)}" if m else None
 
 
 def normalize_timestamp(timestamp: Any) -> Optional[str]:
@@ -119,9 +173,7 @@ def normalize_timestamp(timestamp: Any) -> Optional[str]:
     try:
         # Falls bereits ein String (ISO format)
         if isinstance(timestamp, str):
-            # Validierung durch Parsing
-            dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-            return dt.isoformat()
+            return _normalize_iso(timestamp)
 
         # Falls Unix timestamp (Sekunden)
         if isinstance(timestamp, (int, float)):
@@ -134,45 +186,65 @@ def normalize_timestamp(timestamp: Any) -> Optional[str]:
     return None
 
 
+@lru_cache(maxsize=256)
+def _normalize_iso(timestamp: str) -> str:
+    # Validierung durch Parsing; dieselben last_used-Strings kommen pro Sync mehrfach vor
+    return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).isoformat()
+
+
+@lru_cache(maxsize=512)
+def _parse_epoch(timestamp: str) -> float:
+    # Spoolman-Zeitstempel ändern sich nur bei Benutzeraktionen, bleiben also über Syncs gleich
+    return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp()
+
+
+FilamentIndex = Dict[tuple, List[Dict[str, Any]]]
+
+
+def _filament_index_key(material: Any, vendor_name: Any, color_hex: Any) -> tuple:
+    """Vergleichsschlüssel (case-insensitive); fehlende Farbe passt nur zu fehlender Farbe."""
+    return ((material or "").lower(), (vendor_name or "").lower(), (color_hex or "").lower())
+
+
+def index_filament(index: FilamentIndex, sm_fil: Dict[str, Any]):
+    """Nimmt ein Spoolman-Filament in den Index auf (Reihenfolge bleibt erhalten)."""
+    # Vendor kann ein Dict oder String sein
+    sm_vendor = sm_fil.get("vendor")
+    if isinstance(sm_vendor, dict):
+        sm_vendor_name = sm_vendor.get("name", "")
+    else:
+        sm_vendor_name = str(sm_vendor) if sm_vendor else ""
+
+    key = _filament_index_key(sm_fil.get("material"), sm_vendor_name, sm_fil.get("color_hex"))
+    index.setdefault(key, []).append(sm_fil)
+
+
+def build_filament_index(sm_filaments: List[Dict[str, Any]]) -> FilamentIndex:
+    """
+    Indiziert die Spoolman-Filamente einmal pro Sync nach Material, Marke und
+    Farbe, damit find_matching_filament nicht jedes Mal alle Filamente scannt.
+    """
+    index: FilamentIndex = {}
+    for sm_fil in sm_filaments:
+        index_filament(index, sm_fil)
+    return index
+
+
 def find_matching_filament(
-    sm_filaments: List[Dict[str, Any]],
+    filament_index: FilamentIndex,
     filament_data: Dict[str, Any]
 ) -> Optional[Dict[str, Any]]:
     """
     Sucht nach einem passenden Filament in Spoolman basierend auf Material, Durchmesser, Marke UND Farbe.
     """
-    for sm_fil in sm_filaments:
-        # Vergleiche Material, Durchmesser und Marke
-        material_match = (
-            sm_fil.get("material", "").lower() == filament_data.get("material", "").lower()
-        )
-        diameter_match = (
-            abs(float(sm_fil.get("diameter", 0)) - float(filament_data.get("diameter_mm", 0))) < 0.01
-        )
-
-        # Vendor kann ein Dict oder String sein
-        sm_vendor = sm_fil.get("vendor")
-        if isinstance(sm_vendor, dict):
-            sm_vendor_name = sm_vendor.get("name", "")
-        else:
-            sm_vendor_name = str(sm_vendor) if sm_vendor else ""
-
-        vendor_match = (
-            sm_vendor_name.lower() == filament_data.get("brand", "").lower()
-        )
-
-        # Farbe vergleichen (wichtig für verschiedene Farben desselben Materials!)
-        color_match = True  # Default: Farbe nicht prüfen wenn nicht vorhanden
-        if filament_data.get("color_hex") and sm_fil.get("color_hex"):
-            # Beide haben Farbe → vergleichen
-            color_match = (
-                sm_fil.get("color_hex", "").lower() == filament_data.get("color_hex", "").lower()
-            )
-        elif filament_data.get("color_hex") or sm_fil.get("color_hex"):
-            # Nur einer hat Farbe → kein Match
-            color_match = False
-
-        if material_match and diameter_match and vendor_match and color_match:
+    # Material, Marke und Farbe über den Index (wichtig für verschiedene
+    # Farben desselben Materials!), Durchmesser mit Toleranz im Bucket
+    key = _filament_index_key(
+        filament_data.get("material"), filament_data.get("brand"), filament_data.get("color_hex")
+    )
+    diameter = float(filament_data.get("diameter_mm", 0))
+    for sm_fil in filament_index.get(key, ()):
+        if abs(float(sm_fil.get("diameter") or 0) - diameter) < 0.01:
             return sm_fil
 
     return None
@@ -190,9 +262,10 @@ def calculate_weight_from_length(
     return round((length_mm / 1000.0) * gpm, 2)
 
 
-async def update_simplyprint_usage(spc, uid: str, remaining_weight_g: float, sp_filament: Dict[str, Any], initial_weight_g: float = None):
+async def update_simplyprint_usage(spc, uid: str, remaining_weight_g: float, sp_filament: Dict[str, Any], initial_weight_g: float = None) -> bool:
     """
     Aktualisiert SimplyPrint basierend auf Spoolman Gewichts-Daten.
+    Gibt False zurück, wenn das Update fehlgeschlagen ist.
 
     Args:
         spc: SimplyPrintClient
@@ -234,10 +307,10 @@ async def update_simplyprint_usage(spc, uid: str, remaining_weight_g: float, sp_
         else:
             length_used_percent = 0
 
-        logger.debug(f"Update Payload für {uid} (ID: {filament_id}): {remaining_weight_g}g / {total_weight_g}g = {length_used_percent}%")
+        logger.debug("Update Payload für %s (ID: %s): %sg / %sg = %s%%", uid, filament_id, remaining_weight_g, total_weight_g, length_used_percent)
 
         # Debug: Zeige alle verfügbaren Felder in sp_filament
-        logger.debug(f"Verfügbare sp_filament Felder für {uid}: {list(sp_filament.keys())}")
+        logger.debug("Verfügbare sp_filament Felder für %s: %s", uid, sp_filament.keys())
 
         # WICHTIG: Alle Felder aus dem Original-Filament übernehmen!
         # SimplyPrint Create/Update erfordert ALLE Felder, sonst werden sie überschrieben
@@ -265,24 +338,29 @@ async def update_simplyprint_usage(spc, uid: str, remaining_weight_g: float, sp_
 
         # Material Type - SimplyPrint braucht filament_type als INTEGER (Type ID)
         sp_type = sp_filament.get("type", {})
-        if isinstance(sp_type, dict) and sp_type.get("id"):
-            payload["filament_type"] = int(sp_type.get("id"))  # Type ID als Integer
-        elif sp_filament.get("filament_type"):
-            payload["filament_type"] = int(sp_filament.get("filament_type"))
+        type_id = sp_type.get("id") if isinstance(sp_type, dict) else None
+        if not type_id:
+            type_id = sp_filament.get("filament_type")
+        if type_id:
+            # Meist liefert die API bereits einen Integer
+            payload["filament_type"] = type_id if isinstance(type_id, int) else int(type_id)
         else:
             # Fallback: Verwende eine Default Type ID
             logger.warning(f"Keine Type ID für {uid}, verwende Fallback")
             payload["filament_type"] = 1  # Fallback Type ID
 
         # Debug: Zeige kompletten Payload
-        logger.debug(f"SimplyPrint Update Payload für {uid} (ID: {filament_id}): {payload}")
+        logger.debug("SimplyPrint Update Payload für %s (ID: %s): %s", uid, filament_id, payload)
 
         # Verwende die numerische ID für das Update
-        result = await spc.update_filament(str(filament_id), payload)
+        result = await spc.update_filament(filament_id, payload)
         logger.info(f"SimplyPrint Filament {uid} (ID: {filament_id}) aktualisiert: length_used={length_used_percent}%")
-        logger.debug(f"SimplyPrint API Response: {result}")
+        logger.debug("SimplyPrint API Response: %s", result)
 
-        # Verifiziere, ob der Wert wirklich gespeichert wurde
+        # Optional verifizieren, ob der Wert wirklich gespeichert wurde (lädt die
+        # komplette Filament-Liste, daher nur bei Bedarf per VERIFY_SIMPLYPRINT)
+        if S.get("VERIFY_SIMPLYPRINT", "false") != "true":
+            return True
         try:
             verification = await spc.list_filaments()
             if verification and "filament" in verification:
@@ -295,8 +373,14 @@ async def update_simplyprint_usage(spc, uid: str, remaining_weight_g: float, sp_
                         break
         except Exception as verify_error:
             logger.warning(f"Verifikation nach Update für {uid} fehlgeschlagen: {verify_error}")
+        return True
     except Exception as e:
         logger.error(f"Fehler beim Aktualisieren von SimplyPrint Filament {uid}: {e}")
+        return False
+
+
+_STANDARD_WEIGHTS = (250, 500, 1000, 2000, 5000, 10000)
+_STANDARD_WEIGHTS_JAYO = (250, 500, 1000, 1100, 2000, 5000, 10000)
 
 
 def round_to_standard_weight(weight_g: float, brand: str = "") -> float:
@@ -305,13 +389,21 @@ def round_to_standard_weight(weight_g: float, brand: str = "") -> float:
     z.B. 988g → 1000g, 1088g → 1100g (nur JAYO), sonst → 1000g
     """
     # Standard-Gewichte (1100g nur für JAYO)
-    if brand.upper() == "JAYO" and 1000 < weight_g < 1200:
-        standard_weights = [250, 500, 1000, 1100, 2000, 5000, 10000]
+    if 1000 < weight_g < 1200 and brand.upper() == "JAYO":
+        standard_weights = _STANDARD_WEIGHTS_JAYO
     else:
-        standard_weights = [250, 500, 1000, 2000, 5000, 10000]
-
-    # Finde nächstes Standard-Gewicht
-    closest = min(standard_weights, key=lambda x: abs(x - weight_g))
+        standard_weights = _STANDARD_WEIGHTS
+
+    # Nächstes Standard-Gewicht per Bisektion (Tupel sind sortiert);
+    # bei Gleichstand gewinnt wie bisher das kleinere Gewicht
+    i = bisect_left(standard_weights, weight_g)
+    if i == 0:
+        closest = standard_weights[0]
+    elif i == len(standard_weights):
+        closest = standard_weights[-1]
+    else:
+        lower, upper = standard_weights[i - 1], standard_weights[i]
+        closest = upper if upper - weight_g < weight_g - lower else lower
 
     # Wenn innerhalb von ±12% des Standard-Gewichts, runde darauf
     tolerance = 0.12
@@ -321,6 +413,13 @@ def round_to_standard_weight(weight_g: float, brand: str = "") -> float:
     return weight_g
 
 
+# Bekannte Material-Typen mit Varianten (längere zuerst!)
+KNOWN_MATERIALS = (
+    "PLA+", "PETG-CF", "PLA-CF", "ABS+", "TPU-95A", "TPU-98A",
+    "PETG", "PLA", "ABS", "TPU", "NYLON", "ASA", "PC", "PP", "PVA", "HIPS",
+)
+
+
 def extract_material_type(type_field: Any) -> str:
     """
     Extrahiert den reinen Material-Typ aus dem SimplyPrint type-Feld.
@@ -333,30 +432,11 @@ def extract_material_type(type_field: Any) -> str:
         material = str(type_field) if type_field else "Unknown"
 
     material = material.strip()
-    material_upper = material.upper()
-
-    # Liste bekannter Material-Typen mit Varianten (längere zuerst!)
-    known_materials = [
-        "PLA+", "PETG-CF", "PLA-CF", "ABS+", "TPU-95A", "TPU-98A",
-        "PETG", "PLA", "ABS", "TPU", "NYLON", "ASA", "PC", "PP", "PVA", "HIPS"
-    ]
-
-    # Suche nach bekanntem Material-Typ im String (längere Matches haben Priorität)
-    for mat in known_materials:
-        # Exakte Übereinstimmung (mit oder ohne Hersteller-Präfix)
-        if material_upper == mat:
-            return mat
 
-        # Material am Ende (z.B. "JAYO PLA+")
-        if material_upper.endswith(" " + mat):
-            return mat
-
-        # Material am Anfang (z.B. "PLA+ Natural")
-        if material_upper.startswith(mat + " "):
-            return mat
-
-        # Material alleine in Wort-Liste
-        words = material_upper.split()
+    # Bekanntes Material als eigenes Wort im String, z.B. "PETG", "JAYO PLA+",
+    # "PLA+ Natural" (Priorität nach Listen-Reihenfolge, nicht nach Position)
+    words = set(material.upper().split())
+    for mat in KNOWN_MATERIALS:
         if mat in words:
             return mat
 
@@ -371,6 +451,19 @@ def extract_material_type(type_field: Any) -> str:
     return material
 
 
+def resolve_type_data(sp_filament: Dict[str, Any], sp_types: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
+    """Eintrag aus der SimplyPrint Type API zum Filament (per type-ID) oder None."""
+    if not sp_types:
+        return None
+    type_obj = sp_filament.get("type")
+    type_id = None
+    if isinstance(type_obj, dict):
+        type_id = type_obj.get("id")
+    elif isinstance(type_obj, int):
+        type_id = type_obj
+    return sp_types.get(str(type_id)) if type_id else None
+
+
 def extract_filament_data(sp_filament: Dict[str, Any], sp_types: Dict[str, Any] = None) -> Dict[str, Any]:
     """
     Extrahiert und normalisiert Filament-Daten aus SimplyPrint.
@@ -388,9 +481,13 @@ def extract_filament_data(sp_filament: Dict[str, Any], sp_types: Dict[str, Any]
         sp_filament: Filament-Daten aus SimplyPrint
         sp_types: Optional - Filament-Types Dictionary aus GET /{id}/filament/type/Get
     """
+    # Type-Daten einmal auflösen (Material, Maße, Name, Temperaturen, Kosten)
+    type_obj = sp_filament.get("type")
+    type_data = resolve_type_data(sp_filament, sp_types)
+
     # Material-Typ extrahieren (nur PLA/PETG/etc., ohne Hersteller)
     # WICHTIG: Wird später aus Type API überschrieben falls verfügbar!
-    material = extract_material_type(sp_filament.get("type"))
+    material = extract_material_type(type_obj)
 
     # Brand extrahieren (priorisiere Filament-Brand)
     brand = sp_filament.get("brand", "").strip() or "Unknown"
@@ -399,70 +496,47 @@ def extract_filament_data(sp_filament: Dict[str, Any], sp_types: Dict[str, Any]
     diameter_mm = float(sp_filament.get("dia", 1.75))
     density_g_cm3 = float(sp_filament.get("density", 1.24))
 
-    # Wenn sp_types verfügbar, versuche bessere Werte aus dem Type zu holen
-    if sp_types:
-        type_obj = sp_filament.get("type")
-        type_id = None
-
-        if isinstance(type_obj, dict):
-            type_id = type_obj.get("id")
-        elif isinstance(type_obj, int):
-            type_id = type_obj
-
-        if type_id and str(type_id) in sp_types:
-            type_data = sp_types[str(type_id)]
-
-            # Material-Typ aus Type API verwenden (das ist das sauberste!)
-            if type_data.get("material_type_name"):
-                material = type_data["material_type_name"]
-                logger.debug(f"Material aus Type API: {material}")
-            elif type_data.get("filament_type_name"):
-                material = type_data["filament_type_name"]
-                logger.debug(f"Material aus Type API (legacy): {material}")
-
-            # Überschreibe mit Werten aus Type, falls vorhanden
-            if type_data.get("density"):
-                density_g_cm3 = float(type_data["density"])
-            if type_data.get("width"):
-                diameter_mm = float(type_data["width"])
-            elif type_data.get("diameter") or type_data.get("dia"):
-                diameter_mm = float(type_data.get("diameter") or type_data.get("dia", diameter_mm))
-
-            # Brand aus Type verwenden wenn im Filament nicht gesetzt
-            if brand == "Unknown" and type_data.get("brand"):
-                if isinstance(type_data["brand"], dict):
-                    brand = type_data["brand"].get("name", "Unknown")
-                else:
-                    brand = type_data["brand"]
+    # Wenn Type-Daten verfügbar, versuche bessere Werte aus dem Type zu holen
+    if type_data:
+        # Material-Typ aus Type API verwenden (das ist das sauberste!)
+        if type_data.get("material_type_name"):
+            material = type_data["material_type_name"]
+            logger.debug("Material aus Type API: %s", material)
+        elif type_data.get("filament_type_name"):
+            material = type_data["filament_type_name"]
+            logger.debug("Material aus Type API (legacy): %s", material)
+
+        # Überschreibe mit Werten aus Type, falls vorhanden
+        if type_data.get("density"):
+            density_g_cm3 = float(type_data["density"])
+        if type_data.get("width"):
+            diameter_mm = float(type_data["width"])
+        elif type_data.get("diameter") or type_data.get("dia"):
+            diameter_mm = float(type_data.get("diameter") or type_data.get("dia", diameter_mm))
+
+        # Brand aus Type verwenden wenn im Filament nicht gesetzt
+        if brand == "Unknown" and type_data.get("brand"):
+            if isinstance(type_data["brand"], dict):
+                brand = type_data["brand"].get("name", "Unknown")
+            else:
+                brand = type_data["brand"]
 
     # Spulengewicht (leer)
     spool_weight = sp_filament.get("spoolWeight") or sp_filament.get("spool_weight")
 
     # Zuletzt benutzt - SimplyPrint kann verschiedene Felder haben
-    last_used = None
-    for field in ["lastUsed", "last_used", "used", "lastActive"]:
-        if sp_filament.get(field):
-            last_used = sp_filament.get(field)
-            break
+    last_used = (
+        sp_filament.get("lastUsed")
+        or sp_filament.get("last_used")
+        or sp_filament.get("used")
+        or sp_filament.get("lastActive")
+        or None
+    )
 
     # Name: profile_name aus Type API + Farbe
-    profile_name = None
-
-    # Hole profile_name aus Type API
-    if sp_types:
-        type_obj = sp_filament.get("type")
-        type_id = None
-
-        if isinstance(type_obj, dict):
-            type_id = type_obj.get("id")
-        elif isinstance(type_obj, int):
-            type_id = type_obj
-
-        if type_id and str(type_id) in sp_types:
-            type_data = sp_types[str(type_id)]
-            if type_data.get("profile_name"):
-                profile_name = type_data["profile_name"]
-                logger.debug(f"profile_name aus Type API: {profile_name}")
+    profile_name = type_data.get("profile_name") if type_data else None
+    if profile_name:
+        logger.debug("profile_name aus Type API: %s", profile_name)
 
     # Name = profile_name + Farbe (oder Fallback auf Material + Farbe)
     color_name = sp_filament.get('colorName', '').strip()
@@ -478,29 +552,30 @@ def extract_filament_data(sp_filament: Dict[str, Any], sp_types: Dict[str, Any]
     bed_temp = None
     cost = None
 
-    if sp_types:
-        type_obj = sp_filament.get("type")
-        type_id = None
-
-        if isinstance(type_obj, dict):
-            type_id = type_obj.get("id")
-        elif isinstance(type_obj, int):
-            type_id = type_obj
-
-        if type_id and str(type_id) in sp_types:
-            type_data = sp_types[str(type_id)]
-
-            # Temperaturen aus temps-Objekt
-            if type_data.get("temps"):
-                temps = type_data["temps"]
-                if temps.get("nozzle"):
-                    extruder_temp = int(temps["nozzle"])
-                if temps.get("bed"):
-                    bed_temp = int(temps["bed"])
-
-            # Kosten (in SimplyPrint in Cent, zu Euro konvertieren)
-            if type_data.get("cost"):
-                cost = float(type_data["cost"]) / 100.0
+    if type_data:
+        # Temperaturen aus temps-Objekt
+        if type_data.get("temps"):
+            temps = type_data["temps"]
+            if temps.get("nozzle"):
+                extruder_temp = int(temps["nozzle"])
+            if temps.get("bed"):
+                bed_temp = int(temps["bed"])
+
+        # Kosten (in SimplyPrint in Cent, zu Euro konvertieren)
+        if type_data.get("cost"):
+            cost = float(type_data["cost"]) / 100.0
+
+    # Gesamtgewicht einmal berechnen (auf Standard-Gewicht gerundet), wird beim
+    # Anlegen von Filament/Spule und im bidirektionalen Sync wiederverwendet
+    initial_weight_g = None
+    if sp_filament.get("total") is not None:
+        try:
+            initial_weight_g = round_to_standard_weight(
+                calculate_weight_from_length(float(sp_filament["total"]), density_g_cm3, diameter_mm),
+                brand
+            )
+        except (ValueError, TypeError):
+            pass
 
     return {
         "uid": sp_filament.get("uid"),  # 4-Zeichen Code
@@ -513,6 +588,7 @@ def extract_filament_data(sp_filament: Dict[str, Any], sp_types: Dict[str, Any]
         "nominal_weight_g": None,  # SimplyPrint hat kein direktes Filament-Gewicht
         "total_length_mm": sp_filament.get("total"),  # Gesamtlänge in mm
         "left_length_mm": sp_filament.get("left"),   # Verbleibend in mm
+        "initial_weight_g": initial_weight_g,  # Gesamtgewicht in g (gerundet) oder None
         "spool_weight_g": float(spool_weight) if spool_weight else None,  # Gewicht der leeren Spule oder None
         "last_used": last_used,  # Zuletzt benutzt Timestamp
         "extruder_temp": extruder_temp,  # Düsentemperatur
@@ -524,26 +600,25 @@ def extract_filament_data(sp_filament: Dict[str, Any], sp_types: Dict[str, Any]
 async def ensure_vendor(
     smc: SpoolmanClient,
     brand_name: str,
-    sm_vendors: Dict[str, Dict[str, Any]]
+    sm_vendors: Dict[str, Dict[str, Any]],
+    config: Optional[SyncConfig] = None
 ) -> Optional[int]:
     """
     Stellt sicher, dass ein Vendor in Spoolman existiert.
     Gibt die Vendor-ID zurück oder None bei Fehler.
+    sm_vendors ist nach Namen indiziert (name.lower() -> vendor).
     """
     if not brand_name or brand_name == "Unknown":
         return None
 
-    # Normalisierte Suche (case-insensitive)
-    brand_lower = brand_name.lower()
-
-    # Suche in existierenden Vendors
-    for vendor_id, vendor in sm_vendors.items():
-        vendor_name = vendor.get("name", "")
-        if vendor_name.lower() == brand_lower:
-            return vendor.get("id")
+    # Normalisierte Suche (case-insensitive) über den Namensindex
+    vendor = sm_vendors.get(brand_name.lower())
+    if vendor:
+        return vendor.get("id")
 
     # Vendor existiert nicht, erstelle ihn
-    if S.get("DRY_RUN", "false") == "true":
+    config = config or SyncConfig.from_settings()
+    if config.dry_run:
         logger.info(f"[DRY-RUN] Würde Vendor erstellen: {brand_name}")
         return None
 
@@ -552,7 +627,7 @@ async def ensure_vendor(
         vendor_id = new_vendor.get("id")
         logger.info(f"Vendor erstellt in Spoolman: {vendor_id} - {brand_name}")
         # Zur Map hinzufügen
-        sm_vendors[str(vendor_id)] = new_vendor
+        sm_vendors[brand_name.lower()] = new_vendor
         return vendor_id
     except Exception as e:
         logger.error(f"Fehler beim Erstellen von Vendor '{brand_name}': {e}")
@@ -564,8 +639,10 @@ async def ensure_spoolman_spool(
     uid: str,
     filament_data: Dict[str, Any],
     lot_map: Dict[str, Any],
-    sm_filaments: List[Dict[str, Any]],
-    sm_vendors: Dict[str, Dict[str, Any]]
+    filament_index: FilamentIndex,
+    sm_vendors: Dict[str, Dict[str, Any]],
+    create_lock: Optional[asyncio.Lock] = None,
+    config: Optional[SyncConfig] = None
 ) -> Optional[Dict[str, Any]]:
     """
     Stellt sicher, dass eine Spule in Spoolman existiert.
@@ -577,68 +654,59 @@ async def ensure_spoolman_spool(
         sync_status.increment("updated")
         return lot_map[uid]
 
-    if S.get("DRY_RUN", "false") == "true":
+    config = config or SyncConfig.from_settings()
+    if config.dry_run:
         logger.info(f"[DRY-RUN] Würde Spule mit lot_nr={uid} in Spoolman erstellen")
         return None
 
     try:
-        # Suche nach existierendem Filament
-        sm_fil = find_matching_filament(sm_filaments, filament_data)
+        # Gesamtgewicht aus extract_filament_data (Länge 0 → kein Gewicht setzen)
+        total_weight = filament_data.get("initial_weight_g") or None
 
-        if sm_fil:
-            logger.info(f"Bestehendes Filament gefunden: {sm_fil.get('id')} - {sm_fil.get('name')}")
-        else:
-            # Vendor sicherstellen
-            vendor_id = None
-            if filament_data.get("brand"):
-                vendor_id = await ensure_vendor(smc, filament_data["brand"], sm_vendors)
-
-            # Filament in Spoolman erstellen
-            sm_fil_payload = {
-                "name": filament_data["name"],
-                "diameter": filament_data["diameter_mm"],
-                "density": filament_data["density_g_cm3"],
-            }
-            if filament_data.get("material"):
-                sm_fil_payload["material"] = filament_data["material"]
-            if vendor_id:
-                sm_fil_payload["vendor_id"] = vendor_id
-            if filament_data["color_hex"]:
-                sm_fil_payload["color_hex"] = filament_data["color_hex"]
-
-            # Temperaturen aus SimplyPrint Type API
-            if filament_data.get("extruder_temp"):
-                sm_fil_payload["settings_extruder_temp"] = filament_data["extruder_temp"]
-            if filament_data.get("bed_temp"):
-                sm_fil_payload["settings_bed_temp"] = filament_data["bed_temp"]
-
-            # Kosten aus SimplyPrint Type API
-            if filament_data.get("cost"):
-                sm_fil_payload["price"] = filament_data["cost"]
-
-            # Gewicht: Berechne aus total_length wenn vorhanden und runde auf Standard-Gewicht
-            if filament_data.get("total_length_mm"):
-                weight = calculate_weight_from_length(
-                    filament_data["total_length_mm"],
-                    filament_data["density_g_cm3"],
-                    filament_data["diameter_mm"]
-                )
-                sm_fil_payload["weight"] = round_to_standard_weight(weight, filament_data.get("brand", ""))
-
-            sm_fil = await smc.create_filament(sm_fil_payload)
-            logger.info(f"Filament erstellt in Spoolman: {sm_fil.get('id')} - {filament_data['name']}")
-            # Zur Liste hinzufügen für zukünftige Matches
-            sm_filaments.append(sm_fil)
-
-        # Gesamtgewicht aus SimplyPrint-Länge berechnen und auf Standard-Gewicht runden
-        total_weight = None
-        if filament_data.get("total_length_mm"):
-            calculated_weight = calculate_weight_from_length(
-                filament_data["total_length_mm"],
-                filament_data["density_g_cm3"],
-                filament_data["diameter_mm"]
-            )
-            total_weight = round_to_standard_weight(calculated_weight, filament_data.get("brand", ""))
+        # Suchen + Anlegen serialisieren: parallele Läufe würden sonst dasselbe
+        # Filament (bzw. denselben Vendor) doppelt in Spoolman anlegen
+        async with create_lock or nullcontext():
+            # Suche nach existierendem Filament
+            sm_fil = find_matching_filament(filament_index, filament_data)
+
+            if sm_fil:
+                logger.info(f"Bestehendes Filament gefunden: {sm_fil.get('id')} - {sm_fil.get('name')}")
+            else:
+                # Vendor sicherstellen
+                vendor_id = None
+                if filament_data.get("brand"):
+                    vendor_id = await ensure_vendor(smc, filament_data["brand"], sm_vendors, config)
+
+                # Filament in Spoolman erstellen
+                sm_fil_payload = {
+                    "name": filament_data["name"],
+                    "diameter": filament_data["diameter_mm"],
+                    "density": filament_data["density_g_cm3"],
+                }
+                if filament_data.get("material"):
+                    sm_fil_payload["material"] = filament_data["material"]
+                if vendor_id:
+                    sm_fil_payload["vendor_id"] = vendor_id
+                if filament_data["color_hex"]:
+                    sm_fil_payload["color_hex"] = filament_data["color_hex"]
+
+                # Temperaturen aus SimplyPrint Type API
+                if filament_data.get("extruder_temp"):
+                    sm_fil_payload["settings_extruder_temp"] = filament_data["extruder_temp"]
+                if filament_data.get("bed_temp"):
+                    sm_fil_payload["settings_bed_temp"] = filament_data["bed_temp"]
+
+                # Kosten aus SimplyPrint Type API
+                if filament_data.get("cost"):
+                    sm_fil_payload["price"] = filament_data["cost"]
+
+                if total_weight is not None:
+                    sm_fil_payload["weight"] = total_weight
+
+                sm_fil = await smc.create_filament(sm_fil_payload)
+                logger.info(f"Filament erstellt in Spoolman: {sm_fil.get('id')} - {filament_data['name']}")
+                # In den Index aufnehmen für zukünftige Matches
+                index_filament(filament_index, sm_fil)
 
         # Spule in Spoolman erstellen
         spool_payload = {
@@ -675,14 +743,23 @@ async def ensure_spoolman_spool(
         return None
 
 
+def spool_filament_id(sm_spool: Dict[str, Any]) -> Optional[int]:
+    """Filament-ID einer Spoolman-Spule (verschachteltes "filament" oder "filament_id")."""
+    sm_filament = sm_spool.get("filament")
+    if isinstance(sm_filament, dict):
+        return sm_filament.get("id")
+    return sm_spool.get("filament_id")
+
+
 async def calculate_and_sync_usage(
     smc: SpoolmanClient,
     spc,
     filament_data: Dict[str, Any],
     sm_spool: Dict[str, Any],
     last_sync_time: Optional[float] = None,
-    sp_filament: Optional[Dict[str, Any]] = None
-) -> float:
+    sp_filament: Optional[Dict[str, Any]] = None,
+    config: Optional[SyncConfig] = None
+) -> Tuple[float, str]:
     """
     Berechnet den Verbrauch aus SimplyPrint-Längen und synchronisiert zu Spoolman.
     Unterstützt bidirektionale Synchronisation bei Waagen-Messungen.
@@ -693,22 +770,27 @@ async def calculate_and_sync_usage(
         filament_data: Filament-Daten aus SimplyPrint
         sm_spool: Spulen-Daten aus Spoolman
         last_sync_time: Timestamp des letzten Syncs (Unix timestamp)
+        config: Einstellungen des Sync-Laufs (sonst aus den Settings)
 
     Returns:
-        Das aktuelle used_weight
+        (aktuelles used_weight, Status): "synced" wenn beide Seiten übereinstimmen
+        (kein Update nötig oder Update erfolgreich), "pending" wenn nicht
+        geschrieben wurde (Dry-Run, sp_filament fehlt), "failed" wenn ein
+        Schreibzugriff auf Spoolman oder SimplyPrint fehlgeschlagen ist
     """
     total = filament_data.get("total_length_mm")
     left = filament_data.get("left_length_mm")
-    
+    cur_used = float(sm_spool.get("used_weight") or 0)
+
     if total is None or left is None:
-        logger.debug(f"Keine Längenangaben für lot_nr={filament_data['uid']}")
-        return float(sm_spool.get("used_weight") or 0)
+        logger.debug("Keine Längenangaben für lot_nr=%s", filament_data['uid'])
+        return cur_used, "synced"
     
     try:
         length_used_mm = max(0.0, float(total) - float(left))
     except (ValueError, TypeError):
         logger.warning(f"Ungültige Längenangaben für lot_nr={filament_data['uid']}")
-        return float(sm_spool.get("used_weight") or 0)
+        return cur_used, "synced"
     
     # Gramm pro Meter berechnen
     gpm = grams_per_meter(
@@ -717,10 +799,16 @@ async def calculate_and_sync_usage(
     ) or 2.98  # Fallback für PLA 1.75mm
 
     used_g = round((length_used_mm / 1000.0) * gpm, 2)
-    cur_used = float(sm_spool.get("used_weight") or 0)
+    delta = abs(used_g - cur_used)
+    config = config or SyncConfig.from_settings()
+    eps = config.epsilon_grams
+    dry_run = config.dry_run
 
     # Debug: Zeige Berechnungsgrundlage
-    logger.debug(f"Verbrauchsberechnung für {filament_data['uid']}: total={total}mm, left={left}mm, used={length_used_mm}mm → {used_g}g (SimplyPrint), Spoolman aktuell: {cur_used}g")
+    logger.debug(
+        "Verbrauchsberechnung für %s: total=%smm, left=%smm, used=%smm → %sg (SimplyPrint), Spoolman aktuell: %sg",
+        filament_data['uid'], total, left, length_used_mm, used_g, cur_used
+    )
 
     # Bidirektionale Synchronisation: Spoolman → SimplyPrint
     #
@@ -734,42 +822,39 @@ async def calculate_and_sync_usage(
         try:
             # Parse ISO timestamp von Spoolman
             if isinstance(sm_updated, str):
-                sm_timestamp = datetime.fromisoformat(sm_updated.replace('Z', '+00:00')).timestamp()
+                sm_timestamp = _parse_epoch(sm_updated)
             else:
                 sm_timestamp = sm_updated
 
-            # Debug-Info
-            sm_dt = datetime.fromtimestamp(sm_timestamp, tz=timezone.utc)
-            last_sync_dt = datetime.fromtimestamp(last_sync_time, tz=timezone.utc)
-            logger.debug(
-                f"Timestamp-Check für lot_nr={filament_data['uid']}: "
-                f"Spoolman={sm_dt.isoformat()} vs LastSync={last_sync_dt.isoformat()}, "
-                f"Δweight={abs(used_g - cur_used):.2f}g (EPS={EPS():.2f}g)"
-            )
+            # Debug-Info (Datums-Konvertierung nur, wenn DEBUG aktiv ist)
+            if logger.isEnabledFor(logging.DEBUG):
+                sm_dt = datetime.fromtimestamp(sm_timestamp, tz=timezone.utc)
+                last_sync_dt = datetime.fromtimestamp(last_sync_time, tz=timezone.utc)
+                logger.debug(
+                    f"Timestamp-Check für lot_nr={filament_data['uid']}: "
+                    f"Spoolman={sm_dt.isoformat()} vs LastSync={last_sync_dt.isoformat()}, "
+                    f"Δweight={delta:.2f}g (EPS={eps:.2f}g)"
+                )
 
             # Wenn Spoolman NEUER als letzter Sync UND Wert abweicht
-            if sm_timestamp > last_sync_time and abs(used_g - cur_used) > EPS():
+            if sm_timestamp > last_sync_time and delta > eps:
                 logger.info(
                     f"Spoolman-Wert ist neuer (manuelle Änderung/Waage) für lot_nr={filament_data['uid']}: "
                     f"Spoolman={cur_used}g vs SimplyPrint={used_g}g - aktualisiere SimplyPrint"
                 )
 
                 # Berechne verbleibendes Gewicht aus Spoolman used_weight
-                initial_weight = sm_spool.get("initial_weight") or round_to_standard_weight(
-                    calculate_weight_from_length(
-                        filament_data["total_length_mm"],
-                        filament_data["density_g_cm3"],
-                        filament_data["diameter_mm"]
-                    ),
-                    filament_data.get("brand", "")
-                )
+                initial_weight = sm_spool.get("initial_weight") or filament_data["initial_weight_g"]
                 remaining_weight = initial_weight - cur_used
 
                 # Aktualisiere SimplyPrint mit korrigiertem Wert (direkt in Gramm!)
-                if S.get("DRY_RUN", "false") != "true":
+                status = "pending"
+                if not dry_run:
                     if sp_filament:
-                        await update_simplyprint_usage(spc, filament_data["uid"], remaining_weight, sp_filament, initial_weight)
-                        logger.info(f"SimplyPrint aktualisiert mit korrigiertem Wert: {remaining_weight:.0f}g verbleibend ({initial_weight}g initial)")
+                        ok = await update_simplyprint_usage(spc, filament_data["uid"], remaining_weight, sp_filament, initial_weight)
+                        status = "synced" if ok else "failed"
+                        if ok:
+                            logger.info(f"SimplyPrint aktualisiert mit korrigiertem Wert: {remaining_weight:.0f}g verbleibend ({initial_weight}g initial)")
 
                         # DB-Update wird in der aufrufenden Funktion gemacht (verhindert DB-Locks)
                     else:
@@ -780,31 +865,24 @@ async def calculate_and_sync_usage(
                 # WICHTIG: Spoolman-Wert beibehalten und NICHT überschreiben!
                 # Normaler Sync-Code wird übersprungen durch return
                 logger.info(f"Bidirektionaler Sync abgeschlossen: Spoolman-Wert ({cur_used}g) bleibt erhalten")
-                return cur_used
+                return cur_used, status
 
         except Exception as e:
             logger.warning(f"Fehler beim Timestamp-Vergleich für lot_nr={filament_data['uid']}: {e}")
 
     # Normal: SimplyPrint → Spoolman
     # Prüfen ob Update nötig ist
-    if abs(used_g - cur_used) <= EPS():
-        logger.debug(f"Kein Update nötig für lot_nr={filament_data['uid']} (Δ={abs(used_g - cur_used):.2f}g)")
-        return used_g
+    if delta <= eps:
+        logger.debug("Kein Update nötig für lot_nr=%s (Δ=%.2fg)", filament_data['uid'], delta)
+        return used_g, "synced"
 
-    if S.get("DRY_RUN", "false") == "true":
-        logger.info(f"[DRY-RUN] Würde used_weight aktualisieren: {cur_used}g → {used_g}g (Δ={abs(used_g - cur_used):.2f}g)")
-        return used_g
+    if dry_run:
+        logger.info(f"[DRY-RUN] Würde used_weight aktualisieren: {cur_used}g → {used_g}g (Δ={delta:.2f}g)")
+        return used_g, "pending"
 
     try:
-        # Filament-ID defensiv extrahieren
-        sm_filament_id = (
-            sm_spool.get("filament", {}).get("id")
-            if isinstance(sm_spool.get("filament"), dict)
-            else sm_spool.get("filament_id")
-        )
-
         update_payload = {
-            "filament_id": sm_filament_id,
+            "filament_id": spool_filament_id(sm_spool),
             "price": sm_spool.get("price"),
             "spool_weight": sm_spool.get("spool_weight"),
             "archived": sm_spool.get("archived", False),
@@ -822,7 +900,7 @@ async def calculate_and_sync_usage(
 
         if last_used_iso:
             update_payload["last_used"] = last_used_iso
-            logger.debug(f"Setze last_used für lot_nr={filament_data['uid']}: {last_used_iso}")
+            logger.debug("Setze last_used für lot_nr=%s: %s", filament_data['uid'], last_used_iso)
 
         await smc.update_spool(sm_spool.get("id"), update_payload)
         logger.info(f"Verbrauch aktualisiert für lot_nr={filament_data['uid']}: {cur_used}g → {used_g}g")
@@ -831,8 +909,9 @@ async def calculate_and_sync_usage(
 
     except Exception as e:
         logger.error(f"Fehler beim Update von used_weight für lot_nr={filament_data['uid']}: {e}")
+        return used_g, "failed"
 
-    return used_g
+    return used_g, "synced"
 
 
 async def sync_single_filament(
@@ -840,26 +919,52 @@ async def sync_single_filament(
     spc,
     sp_filament: Dict[str, Any],
     lot_map: Dict[str, Any],
-    sm_filaments: List[Dict[str, Any]],
+    filament_index: FilamentIndex,
     sm_vendors: Dict[str, Dict[str, Any]],
-    session,
     sp_types: Dict[str, Any] = None,
-    last_sync_time: Optional[float] = None
-) -> bool:
+    last_sync_time: Optional[float] = None,
+    create_lock: Optional[asyncio.Lock] = None,
+    config: Optional[SyncConfig] = None
+) -> Optional[tuple]:
     """
-    Synchronisiert ein einzelnes Filament.
-    Gibt True zurück bei Erfolg, False bei Fehler.
+    Synchronisiert ein einzelnes Filament mit Spoolman/SimplyPrint.
+
+    Schreibt nicht in die lokale DB, sondern gibt die Datensätze dafür zurück
+    (Filament-Dict, Spulen-Dict ohne filament_id, Status), damit der Aufrufer
+    alle Upserts in einer Transaktion ausführen kann. None bei Fehler.
+
+    Status: "synced" (abgeglichen, Stand gemerkt), "pending" (ohne Fehler, aber
+    nicht gemerkt) oder "failed" (ein Schreibzugriff auf Spoolman/SimplyPrint
+    ist fehlgeschlagen; die Datensätze werden trotzdem zurückgegeben).
+
+    Filamente, deren Eingangsdaten (SimplyPrint-Filament, Type, Spoolman-Spule,
+    Einstellungen) seit dem letzten abgeglichenen Lauf unverändert sind, werden
+    ohne API-Aufrufe übersprungen. Gemerkt wird ein Stand nur, wenn beide Seiten
+    bestätigt übereinstimmen (kein Update nötig oder Schreibzugriff erfolgreich).
     """
     try:
+        config = config or SyncConfig.from_settings()
+
+        # Unverändert und beim letzten Mal bereits abgeglichen: nichts zu tun
+        uid = sp_filament.get("uid")
+        sm_existing = lot_map.get(uid) if uid else None
+        digest = None
+        if sm_existing is not None:
+            digest = _input_digest(sp_filament, resolve_type_data(sp_filament, sp_types), sm_existing, config)
+            cached = _filament_results.get(uid)
+            if cached and cached[0] == digest:
+                sync_status.increment("updated")
+                return dict(cached[1]), dict(cached[2]), "synced"
+
         # Daten extrahieren und validieren
         filament_data = extract_filament_data(sp_filament, sp_types)
 
         if not filament_data["uid"]:
             logger.warning(f"Filament ohne UID übersprungen: {sp_filament}")
-            return False
+            return None
 
-        # Filament in lokaler DB speichern/aktualisieren
-        filament_id = upsert_filament(session, {
+        # Datensatz für lokale DB (Filament)
+        filament_row = {
             "name": filament_data["name"],
             "brand": filament_data["brand"],
             "material": filament_data["material"],
@@ -867,36 +972,114 @@ async def sync_single_filament(
             "density_g_cm3": filament_data["density_g_cm3"],
             "color_hex": filament_data["color_hex"],
             "nominal_weight_g": filament_data["nominal_weight_g"],
-        })
+        }
 
         # Spoolman-Spule sicherstellen
-        sm_spool = await ensure_spoolman_spool(smc, filament_data["uid"], filament_data, lot_map, sm_filaments, sm_vendors)
+        sm_spool = await ensure_spoolman_spool(smc, filament_data["uid"], filament_data, lot_map, filament_index, sm_vendors, create_lock, config)
+
+        # Ohne Spule: Dry-Run (nichts geschrieben) oder Anlegen fehlgeschlagen
+        status = "pending" if config.dry_run else "failed"
 
         # Verbrauch berechnen und synchronisieren
         used_g = 0.0
         if sm_spool:
-            used_g = await calculate_and_sync_usage(smc, spc, filament_data, sm_spool, last_sync_time, sp_filament)
-        
-        # Lokale DB aktualisieren
-        upsert_spool(session, {
-            "filament_id": filament_id,
+            used_g, status = await calculate_and_sync_usage(smc, spc, filament_data, sm_spool, last_sync_time, sp_filament, config)
+
+        # Datensatz für lokale DB (Spule)
+        sm = sm_spool or {}
+        spool_row = {
             "lot_nr": filament_data["uid"],
-            "spool_weight_g": sm_spool.get("spool_weight") if sm_spool else None,
-            "price_eur": sm_spool.get("price") if sm_spool else None,
+            "spool_weight_g": sm.get("spool_weight"),
+            "price_eur": sm.get("price"),
             "used_weight_g": used_g,
-            "archived": sm_spool.get("archived", False) if sm_spool else 0,
+            "archived": sm.get("archived", False) if sm_spool else 0,
             "source": "simplyprint",
-        })
-        
-        return True
-        
+        }
+
+        # Nur einen bestätigt abgeglichenen Stand merken (kein Update nötig oder
+        # Schreibzugriff erfolgreich); Dry-Run und Fehler werden neu versucht
+        if status == "synced" and digest is not None and sm_spool is sm_existing:
+            _filament_results[uid] = (digest, dict(filament_row), dict(spool_row))
+            return filament_row, spool_row, "synced"
+
+        _filament_results.pop(uid, None)
+        return filament_row, spool_row, "failed" if status == "failed" else "pending"
+
     except Exception as e:
         logger.error(f"Fehler beim Synchronisieren von Filament: {e}", exc_info=True)
-        return False
+        return None
+
+
+# Abgeglichener Stand je UID: (Eingangs-Digest, Filament-Datensatz, Spulen-Datensatz)
+_filament_results: Dict[str, tuple] = {}
+
+
+# Zuletzt geschriebener Stand je lot_nr (Hash über Filament- + Spulen-Datensatz);
+# unveränderte Datensätze werden beim nächsten Sync nicht erneut geschrieben.
+# Gilt nur für die DB-Generation, in der geschrieben wurde (siehe db.init_db)
+_local_row_hashes: Dict[str, int] = {}
+_local_row_generation: Optional[int] = None
+
+
+# Digest der Eingangsdaten des letzten Laufs, der alle Filamente abgeglichen hat
+# und ohne fehlgeschlagene Schreibzugriffe blieb (siehe _run_sync)
+_last_input_digest: Optional[bytes] = None
+
+
+def _input_digest(*parts) -> bytes:
+    """Stabiler Hash über die API-Antworten (Keys sortiert) und Einstellungen."""
+    return hashlib.blake2b(orjson.dumps(parts, option=orjson.OPT_SORT_KEYS), digest_size=16).digest()
+
 
+def save_local_rows(local_rows: List[tuple]) -> int:
+    """
+    Schreibt die gesammelten Filament-/Spulen-Datensätze in einer Transaktion.
+
+    Überspringt Datensätze, die seit dem letzten Schreiben unverändert sind.
+    Gibt die Anzahl geschriebener Datensätze zurück.
+    """
+    global _local_row_generation
+    if _local_row_generation != db_generation():
+        _local_row_hashes.clear()
+        _local_row_generation = db_generation()
+
+    changed = []
+    hashes = {}
+    for filament_row, spool_row in local_rows:
+        row_hash = hash((tuple(filament_row.items()), tuple(spool_row.items())))
+        if _local_row_hashes.get(spool_row["lot_nr"]) != row_hash:
+            changed.append((filament_row, spool_row))
+            hashes[spool_row["lot_nr"]] = row_hash
+
+    logger.debug("Lokaler Cache: %d geändert, %d unverändert", len(changed), len(local_rows) - len(changed))
+    if not changed:
+        return 0
+
+    # Ein Batch = eine Transaktion = ein gemeinsamer Zeitstempel
+    ts = now()
+    try:
+        with batch_session() as session:
+            filament_ids = upsert_filaments(session, [f for f, _ in changed], ts)
+            for filament_row, spool_row in changed:
+                spool_row["filament_id"] = filament_ids[filament_key(filament_row)]
+            upsert_spools(session, [s for _, s in changed], ts)
+    except Exception:
+        # DB-Stand ungewiss: beim nächsten Sync alles neu schreiben
+        _local_row_hashes.clear()
+        raise
+
+    # Erst nach erfolgreichem Commit merken
+    _local_row_hashes.update(hashes)
+    return len(changed)
+
+
+async def run_sync_once(scheduled: bool = False):
+    """
+    Führt einen vollständigen Synchronisierungslauf durch.
 
-async def run_sync_once():
-    """Führt einen vollständigen Synchronisierungslauf durch."""
+    scheduled=True für Läufe aus dem Scheduler; manuelle Läufe setzen ein
+    verlängertes Intervall auf den Grundwert zurück.
+    """
     # Timestamp vor dem Sync speichern
     sync_start_time = time.time()
 
@@ -905,8 +1088,21 @@ async def run_sync_once():
 
     logger.info("=== Sync gestartet ===")
 
-    spc = SimplyPrintClient()
-    smc = SpoolmanClient()
+    # Geteilte Clients: Verbindungen aus dem Keep-Alive-Pool wiederverwenden;
+    # bleiben offen, auch wenn während des Laufs Einstellungen gespeichert werden
+    async with clients_in_use():
+        changed = await _run_sync(get_simplyprint_client(), get_spoolman_client(), sync_start_time)
+    _adapt_interval(changed, scheduled)
+
+
+async def _run_sync(spc: SimplyPrintClient, smc: SpoolmanClient, sync_start_time: float) -> Optional[bool]:
+    """
+    Sync-Lauf mit den übergebenen API-Clients.
+
+    Gibt True zurück, wenn sich Eingangsdaten geändert haben, False wenn der
+    Lauf mangels Änderungen übersprungen wurde, None wenn er abgebrochen ist.
+    """
+    global _last_input_digest
 
     # Letzten Sync-Timestamp aus Settings laden (falls vorhanden)
     last_sync_time = float(S.get("LAST_SYNC_TIME", "0"))
@@ -916,34 +1112,50 @@ async def run_sync_once():
 
     # 1) Daten von beiden APIs laden
     try:
-        sync_status.set_step("Lade Daten von SimplyPrint...")
-        sp_resp = await spc.list_filaments()
-
-        sync_status.set_step("Lade Daten von Spoolman...")
-        sm_spools = await smc.list_spools()
-        sm_filaments = await smc.list_filaments()
-        sm_vendors_list = await smc.list_vendors()
-
-        sync_status.set_step("Lade Filament-Types...")
-        # Filament-Types von SimplyPrint laden für bessere Material-Daten
-        sp_types_resp = await spc.get_filament_types()
+        sync_status.set_step("Lade Daten von SimplyPrint und Spoolman...")
+        # Alle Abfragen sind unabhängig voneinander: parallel statt nacheinander
+        # (Filament-Types von SimplyPrint für bessere Material-Daten)
+        results = await asyncio.gather(
+            spc.list_filaments(),
+            smc.list_spools(),
+            smc.list_filaments(),
+            smc.list_vendors(),
+            spc.get_filament_types(),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        sp_resp, sm_spools, sm_filaments, sm_vendors_list, sp_types_resp = results
 
         # Response kann "data" oder "types" enthalten, als Array oder Dict
         sp_types = {}
-        if isinstance(sp_types_resp, dict):
-            types_list = sp_types_resp.get("data") or sp_types_resp.get("types")
-            if isinstance(types_list, list):
-                # Array zu Dictionary konvertieren (id -> type_data)
-                sp_types = {str(t.get("id")): t for t in types_list if isinstance(t, dict) and t.get("id")}
-            elif isinstance(types_list, dict):
-                sp_types = types_list
+        types_list = (sp_types_resp.get("data") or sp_types_resp.get("types")) if isinstance(sp_types_resp, dict) else None
+        if isinstance(types_list, list):
+            # Array zu Dictionary konvertieren (id -> type_data)
+            sp_types = {str(t.get("id")): t for t in types_list if isinstance(t, dict) and t.get("id")}
+        elif isinstance(types_list, dict):
+            sp_types = types_list
 
         logger.info(f"SimplyPrint: {len(sp_types)} Filament-Types geladen")
 
     except Exception as e:
         logger.error(f"Fehler beim Laden der Daten: {e}", exc_info=True)
         sync_status.stop(success=False, error=str(e))
-        return
+        return None
+
+    # Einstellungen einmal pro Lauf lesen statt pro Filament
+    config = SyncConfig.from_settings()
+
+    # Beide Seiten (und die Sync-Einstellungen) unverändert seit dem letzten
+    # fehlerfreien Lauf: dieser hat bereits alles abgeglichen, nichts zu tun
+    input_digest = _input_digest(sp_resp, sp_types_resp, sm_spools, sm_filaments, sm_vendors_list, config)
+    if input_digest == _last_input_digest:
+        logger.info("=== Sync übersprungen: keine Änderungen seit letztem Lauf ===")
+        S.set("LAST_SYNC_TIME", str(sync_start_time))
+        dashboard_cache.clear()
+        sync_status.skip()
+        return False
 
     # SimplyPrint Response normalisieren
     # API gibt {"status": true, "filament": {id: {...}, id: {...}}} zurück
@@ -954,27 +1166,19 @@ async def run_sync_once():
             sp_filaments_dict = sp_resp["filament"]
         else:
             logger.error(f"Unerwartetes SimplyPrint Response-Format: {list(sp_resp.keys())}")
-            return
+            return None
     else:
         logger.error(f"SimplyPrint Response ist kein Dictionary: {type(sp_resp)}")
-        return
+        return None
 
-    # Dictionary zu Liste umwandeln
-    sp_filaments = list(sp_filaments_dict.values())
+    # Werte-View statt Listenkopie (mehrfach iterierbar, len() in O(1))
+    sp_filaments = sp_filaments_dict.values()
     logger.info(f"SimplyPrint: {len(sp_filaments)} Filamente gefunden")
 
-    # Debug: Liste alle UIDs auf
-    sp_uids_found = [f.get("uid") for f in sp_filaments if isinstance(f, dict)]
-    logger.debug(f"SimplyPrint UIDs: {sp_uids_found}")
-
     # Spoolman lot_nr Map erstellen
     lot_map: Dict[str, Dict[str, Any]] = {}
     if isinstance(sm_spools, list):
-        lot_map = {
-            s.get("lot_nr"): s
-            for s in sm_spools
-            if isinstance(s, dict) and s.get("lot_nr")
-        }
+        lot_map = {s["lot_nr"]: s for s in sm_spools if isinstance(s, dict) and s.get("lot_nr")}
 
     logger.info(f"Spoolman: {len(lot_map)} Spulen mit lot_nr gefunden")
 
@@ -983,11 +1187,15 @@ async def run_sync_once():
         sm_filaments = []
 
     logger.info(f"Spoolman: {len(sm_filaments)} Filamente gefunden")
+    filament_index = build_filament_index(sm_filaments)
 
-    # Spoolman Vendors zu Dictionary machen (id -> vendor)
+    # Spoolman Vendors nach Name indizieren (name.lower() -> vendor); bei
+    # doppelten Namen gewinnt wie bei der früheren linearen Suche der erste
     sm_vendors: Dict[str, Dict[str, Any]] = {}
     if isinstance(sm_vendors_list, list):
-        sm_vendors = {str(v.get("id")): v for v in sm_vendors_list if isinstance(v, dict)}
+        for v in sm_vendors_list:
+            if isinstance(v, dict):
+                sm_vendors.setdefault((v.get("name") or "").lower(), v)
 
     logger.info(f"Spoolman: {len(sm_vendors)} Vendors gefunden")
 
@@ -995,129 +1203,269 @@ async def run_sync_once():
     success_count = 0
     error_count = 0
 
-    # UIDs die in SimplyPrint vorhanden sind
-    sp_uids = {sp_fil.get("uid") for sp_fil in sp_filaments if isinstance(sp_fil, dict) and sp_fil.get("uid")}
-
     # WICHTIG: DB-Connection NICHT während async API-Calls offen halten!
-    # Sonst: "database is locked" Fehler
+    # Sonst: "database is locked" Fehler. Lokale Datensätze werden daher erst
+    # gesammelt und nach den API-Calls in einer Transaktion geschrieben.
+    # Gültige Einträge und vorhandene UIDs in einem Durchlauf sammeln
+    valid_filaments = []
+    sp_uids = set()
     for sp_filament in sp_filaments:
         if not isinstance(sp_filament, dict):
             logger.warning(f"Überspringe ungültigen Eintrag: {type(sp_filament)}")
             continue
+        valid_filaments.append(sp_filament)
+        if sp_filament.get("uid"):
+            sp_uids.add(sp_filament["uid"])
 
-        # Öffne DB-Connection NUR für dieses eine Filament
-        with get_session() as session:
-            if await sync_single_filament(smc, spc, sp_filament, lot_map, sm_filaments, sm_vendors, session, sp_types, last_sync_time):
-                success_count += 1
-                sync_status.increment("synced")
-            else:
+    # Debug: Liste alle UIDs auf
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("SimplyPrint UIDs: %s", [f.get("uid") for f in valid_filaments])
+
+    # Filamente parallel synchronisieren (HTTP-Latenz überlappen), begrenzt
+    # auf SYNC_CONCURRENCY gleichzeitige Läufe
+    semaphore = asyncio.Semaphore(SYNC_CONCURRENCY)
+    create_lock = asyncio.Lock()
+
+    # Von allen Tasks geteilte Snapshots, die nur gelesen werden: schreibgeschützt
+    # weitergeben (Index und Vendors wachsen beim Anlegen, unter create_lock)
+    lot_map_ro = MappingProxyType(lot_map)
+    sp_types_ro = MappingProxyType(sp_types)
+
+    async def _sync_one(sp_filament):
+        async with semaphore:
+            return await sync_single_filament(
+                smc, spc, sp_filament, lot_map_ro, filament_index, sm_vendors,
+                sp_types_ro, last_sync_time, create_lock, config
+            )
+
+    results = await asyncio.gather(*(_sync_one(f) for f in valid_filaments), return_exceptions=True)
+
+    # Gemerkte Stände für nicht mehr vorhandene Filamente verwerfen
+    for uid in _filament_results.keys() - sp_uids:
+        del _filament_results[uid]
+
+    # Nur wenn jedes Filament abgeglichen (und gemerkt) wurde, darf ein Lauf
+    # mit denselben Eingangsdaten später komplett übersprungen werden
+    all_synced = True
+    local_rows: List[tuple] = []
+    for result in results:
+        if result and not isinstance(result, BaseException):
+            filament_row, spool_row, status = result
+            local_rows.append((filament_row, spool_row))
+            all_synced = all_synced and status == "synced"
+            if status == "failed":
+                # Datensätze trotzdem lokal speichern, Schreibfehler aber zählen
                 error_count += 1
                 sync_status.increment("errors")
-        # DB-Connection wird hier automatisch geschlossen
+                continue
+            success_count += 1
+            sync_status.increment("synced")
+        else:
+            all_synced = False
+            error_count += 1
+            sync_status.increment("errors")
+
+    sync_status.set_step("Speichere lokalen Cache...")
+    try:
+        # Blockierendes SQLite im Thread, damit der Event-Loop (Web-Requests) frei bleibt
+        await asyncio.to_thread(save_local_rows, local_rows)
+    except Exception as e:
+        logger.error(f"Fehler beim Schreiben des lokalen Caches: {e}", exc_info=True)
+        error_count += 1
+        sync_status.increment("errors")
 
     # 3) Spulen in Spoolman verwalten, die nicht mehr in SimplyPrint existieren
-    await cleanup_deleted_spools(smc, lot_map, sp_uids)
+    cleanup_errors = await cleanup_deleted_spools(smc, lot_map, sp_uids, config)
+    if cleanup_errors:
+        error_count += cleanup_errors
+        for _ in range(cleanup_errors):
+            sync_status.increment("errors")
 
     # 4) Sync-Timestamp speichern für nächsten Lauf
     S.set("LAST_SYNC_TIME", str(sync_start_time))
+    dashboard_cache.clear()
+    # Nur fehlerfreie, vollständig abgeglichene Läufe dürfen spätere Läufe
+    # überspringen lassen; fehlgeschlagene Schreibzugriffe werden so wiederholt
+    _last_input_digest = input_digest if error_count == 0 and all_synced else None
 
     logger.info(f"=== Sync abgeschlossen: {success_count} erfolgreich, {error_count} Fehler ===")
 
     # Status aktualisieren
     sync_status.stop(success=error_count == 0, error=f"{error_count} Fehler" if error_count > 0 else None)
+    return True
+
+
+async def _archive_or_delete_spool(
+    smc: SpoolmanClient,
+    lot_nr: str,
+    sm_spool: Dict[str, Any],
+    used_weight: float
+) -> Optional[str]:
+    """Archiviert (benutzt) bzw. löscht (nie benutzt) eine Spule; "archived"/"deleted" oder None bei Fehler."""
+    spool_id = sm_spool.get("id")
+    try:
+        if used_weight > 0:
+            # Archivieren wenn benutzt
+            # lot_nr ist der lot_map-Key, used_weight bereits vom Aufrufer gelesen
+            result = await smc.update_spool(spool_id, {
+                "filament_id": spool_filament_id(sm_spool),
+                "price": sm_spool.get("price"),
+                "spool_weight": sm_spool.get("spool_weight"),
+                "archived": True,
+                "lot_nr": lot_nr,
+                "used_weight": used_weight,
+            })
+            logger.info(f"Spule archiviert: {spool_id} (lot_nr={lot_nr}, used_weight={used_weight}g)")
+            logger.debug("Spoolman Archive Response: %s", result)
+            sync_status.increment("archived")
+            return "archived"
+
+        # Löschen wenn nie benutzt
+        await smc.delete_spool(spool_id)
+        logger.info(f"Spule gelöscht: {spool_id} (lot_nr={lot_nr}, used_weight={used_weight}g)")
+        return "deleted"
+
+    except Exception as e:
+        logger.error(f"Fehler beim Verwalten von Spule {spool_id} (lot_nr={lot_nr}): {e}")
+        return None
 
 
 async def cleanup_deleted_spools(
     smc: SpoolmanClient,
     lot_map: Dict[str, Any],
-    sp_uids: set
-):
+    sp_uids: set,
+    config: Optional[SyncConfig] = None
+) -> int:
     """
     Verwaltet Spulen in Spoolman, die nicht mehr in SimplyPrint existieren.
 
     - Wenn used_weight > 0: Archivieren (wurde benutzt)
     - Wenn used_weight == 0: Löschen (nie benutzt)
+
+    Gibt die Anzahl fehlgeschlagener Archivierungen/Löschungen zurück.
     """
-    deleted_count = 0
-    archived_count = 0
+    config = config or SyncConfig.from_settings()
 
-    for lot_nr, sm_spool in lot_map.items():
-        # Überspringe wenn noch in SimplyPrint vorhanden
-        if lot_nr in sp_uids:
-            continue
+    orphans = []
+    # Nur Spulen, die nicht mehr in SimplyPrint vorhanden sind (Mengendifferenz)
+    for lot_nr in lot_map.keys() - sp_uids:
+        sm_spool = lot_map[lot_nr]
 
         # Überspringe bereits archivierte
         if sm_spool.get("archived"):
             continue
 
-        spool_id = sm_spool.get("id")
         used_weight = float(sm_spool.get("used_weight") or 0)
 
-        if S.get("DRY_RUN", "false") == "true":
+        if config.dry_run:
             action = "archivieren" if used_weight > 0 else "löschen"
-            logger.info(f"[DRY-RUN] Würde Spule {spool_id} (lot_nr={lot_nr}) {action} (used_weight={used_weight}g)")
+            logger.info(f"[DRY-RUN] Würde Spule {sm_spool.get('id')} (lot_nr={lot_nr}) {action} (used_weight={used_weight}g)")
             continue
 
-        try:
-            if used_weight > 0:
-                # Archivieren wenn benutzt
-                # Filament-ID extrahieren
-                sm_filament_id = (
-                    sm_spool.get("filament", {}).get("id")
-                    if isinstance(sm_spool.get("filament"), dict)
-                    else sm_spool.get("filament_id")
-                )
+        orphans.append((lot_nr, sm_spool, used_weight))
 
-                result = await smc.update_spool(spool_id, {
-                    "filament_id": sm_filament_id,
-                    "price": sm_spool.get("price"),
-                    "spool_weight": sm_spool.get("spool_weight"),
-                    "archived": True,
-                    "lot_nr": sm_spool.get("lot_nr"),
-                    "used_weight": sm_spool.get("used_weight"),
-                })
-                logger.info(f"Spule archiviert: {spool_id} (lot_nr={lot_nr}, used_weight={used_weight}g)")
-                logger.debug(f"Spoolman Archive Response: {result}")
-                archived_count += 1
-                sync_status.increment("archived")
-            else:
-                # Löschen wenn nie benutzt
-                await smc.delete_spool(spool_id)
-                logger.info(f"Spule gelöscht: {spool_id} (lot_nr={lot_nr}, used_weight={used_weight}g)")
-                deleted_count += 1
+    if not orphans:
+        return 0
 
-        except Exception as e:
-            logger.error(f"Fehler beim Verwalten von Spule {spool_id} (lot_nr={lot_nr}): {e}")
+    # Archivieren/Löschen parallel, begrenzt wie der Filament-Sync
+    semaphore = asyncio.Semaphore(SYNC_CONCURRENCY)
+
+    async def _bounded(lot_nr, sm_spool, used_weight):
+        async with semaphore:
+            return await _archive_or_delete_spool(smc, lot_nr, sm_spool, used_weight)
+
+    results = await asyncio.gather(*(_bounded(*o) for o in orphans))
+    archived_count = results.count("archived")
+    deleted_count = results.count("deleted")
 
     if archived_count > 0 or deleted_count > 0:
         logger.info(f"Cleanup: {archived_count} archiviert, {deleted_count} gelöscht")
+    return results.count(None)
+
+
+def _aligned_start(interval: int) -> datetime:
+    """Nächstes Vielfaches des Intervalls seit Epoch (z. B. 300s → :00, :05, ...)."""
+    t = (int(time.time()) // interval + 1) * interval
+    return datetime.fromtimestamp(t, tz=timezone.utc)
+
+
+def _interval_bounds() -> tuple:
+    """(Grundintervall, Obergrenze) in Sekunden; Obergrenze 0 = festes Intervall."""
+    base = int(S.get("SYNC_INTERVAL_SECONDS", "300"))
+    return base, max(base, int(S.get("SYNC_INTERVAL_MAX_SECONDS", "0")))
+
+
+def _reschedule(interval: int):
+    """Sync-Job auf ein neues Intervall takten."""
+    global _current_interval
+    _current_interval = interval
+    _scheduler.reschedule_job(
+        SYNC_JOB_ID, trigger="interval", seconds=interval, start_date=_aligned_start(interval)
+    )
+
+
+def _adapt_interval(changed: Optional[bool], scheduled: bool):
+    """
+    Leerlauf-Backoff: nach geplanten Läufen ohne Änderungen verdoppelt sich das
+    Intervall bis zur Obergrenze; Änderungen oder ein manueller Lauf setzen es
+    auf den Grundwert zurück. Abgebrochene Läufe lassen es unverändert.
+
+    Als Leerlauf zählt nur ein übersprungener Lauf (changed=False). Das setzt
+    voraus, dass der vorherige Lauf keine fehlgeschlagenen Schreibzugriffe
+    hatte; Läufe mit Schreibfehlern liefern True und setzen auf den Grundwert.
+    """
+    if changed is None or not _scheduler or _current_interval is None:
+        return
+
+    base, cap = _interval_bounds()
+    if changed or not scheduled:
+        interval = base
+    else:
+        interval = min(cap, _current_interval * 2)
+
+    if interval != _current_interval:
+        _reschedule(interval)
+        logger.info(f"Sync-Intervall angepasst: {interval}s")
 
 
 def start_scheduler():
     """Startet den Scheduler für automatische Syncs."""
-    global _scheduler
+    global _scheduler, _current_interval
     if _scheduler:
         logger.warning("Scheduler läuft bereits")
         return
     
     _scheduler = AsyncIOScheduler()
     interval = int(S.get("SYNC_INTERVAL_SECONDS", "300"))
-    _scheduler.add_job(run_sync_once, "interval", seconds=interval)
+    _current_interval = interval
+    # Verpasste Läufe zusammenfassen und nie zwei Syncs parallel starten,
+    # falls ein Lauf länger als das Intervall dauert
+    _scheduler.add_job(
+        run_sync_once, "interval", seconds=interval, start_date=_aligned_start(interval),
+        kwargs={"scheduled": True},
+        id=SYNC_JOB_ID, coalesce=True, max_instances=1, misfire_grace_time=60,
+        replace_existing=True,
+    )
     _scheduler.start()
     logger.info(f"Scheduler gestartet (Intervall: {interval}s)")
 
 
+def stop_scheduler():
+    """Stoppt den Scheduler (laufende Syncs werden nicht abgewartet)."""
+    global _scheduler
+    if _scheduler:
+        _scheduler.shutdown(wait=False)
+        _scheduler = None
+        logger.info("Scheduler gestoppt")
+
+
 def reconfigure_scheduler():
     """Konfiguriert den Scheduler mit aktuellen Einstellungen neu."""
     if not _scheduler:
         logger.warning("Scheduler nicht aktiv")
         return
     
-    # Alte Jobs entfernen
-    for job in list(_scheduler.get_jobs()):
-        _scheduler.remove_job(job.id)
-    
-    # Neuen Job mit aktuellem Intervall hinzufügen
+    # Job mit aktuellem Intervall neu takten (ein evtl. Backoff beginnt neu)
     interval = int(S.get("SYNC_INTERVAL_SECONDS", "300"))
-    _scheduler.add_job(run_sync_once, "interval", seconds=interval)
+    _reschedule(interval)
     logger.info(f"Scheduler neu konfiguriert (Intervall: {interval}s)")
\ No newline at end of file